@@ -11,8 +11,17 @@ def create_app(config_class=Config):
 
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
-    from app import routes
+    from app import routes, metrics
 
     app.register_blueprint(routes.bp)
+    metrics.init_app(app)
+
+    # Background jobs run in web workers only: the queue starts with the
+    # first request, so CLI commands never claim jobs they cannot finish
+    app.before_request(routes.job_queue.start)
+
+    from app.commands import register_commands
+
+    register_commands(app)
 
     return app
@@ -0,0 +1,100 @@
+import threading
+import boto3
+from botocore.config import Config as BotocoreConfig
+from config import Config
+from app.metrics import instrument_client
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_resource_classes = {}
+_local = threading.local()
+
+
+def client_config():
+    """botocore settings shared by every AWS client the app creates"""
+    return BotocoreConfig(
+        max_pool_connections=Config.AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=Config.AWS_CONNECT_TIMEOUT,
+        read_timeout=Config.AWS_READ_TIMEOUT,
+        tcp_keepalive=Config.AWS_TCP_KEEPALIVE,
+        retries={
+            "mode": Config.AWS_RETRY_MODE,
+            "total_max_attempts": Config.AWS_MAX_ATTEMPTS,
+        },
+    )
+
+
+def get_session():
+    """Process-wide boto3 session (credentials are resolved only once)"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session(
+                aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+                region_name=Config.AWS_DEFAULT_REGION,
+            )
+        return _session
+
+
+def get_client(service_name):
+    """Shared low-level client for a service
+
+    Clients are thread-safe, so every service, route and worker thread uses
+    the same one and its pool of keep-alive connections.
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = get_session().client(
+                    service_name,
+                    endpoint_url=Config.AWS_ENDPOINT_URL,
+                    config=client_config(),
+                )
+                instrument_client(client)
+                _clients[service_name] = client
+    return client
+
+
+def get_resource(service_name):
+    """boto3 resource for the calling thread, backed by the shared client
+
+    Resource objects are not thread-safe, so each thread gets its own; they
+    are thin wrappers and all send requests through get_client().
+    """
+    resources = getattr(_local, "resources", None)
+    if resources is None:
+        resources = _local.resources = {}
+
+    resource = resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource_class = _resource_classes.get(service_name)
+            if resource_class is None:
+                resource_class = type(
+                    get_session().resource(
+                        service_name,
+                        endpoint_url=Config.AWS_ENDPOINT_URL,
+                        config=client_config(),
+                    )
+                )
+                _resource_classes[service_name] = resource_class
+        resource = resources[service_name] = resource_class(
+            client=get_client(service_name)
+        )
+    return resource
+
+
+def get_table(table_name):
+    """DynamoDB Table for the calling thread"""
+    tables = getattr(_local, "tables", None)
+    if tables is None:
+        tables = _local.tables = {}
+
+    table = tables.get(table_name)
+    if table is None:
+        table = tables[table_name] = get_resource("dynamodb").Table(table_name)
+    return table
@@ -0,0 +1,241 @@
+import threading
+import time
+from collections import OrderedDict
+from app.dynamodb_service import DynamoDBService
+from config import Config
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL"""
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Get a live entry (marking it recently used) or default"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store an entry, evicting the least recently used ones if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Read-through lookup: call loader() on a miss and cache its result"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key matches predicate(key)"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedDynamoDBService(DynamoDBService):
+    """DynamoDBService with a read-through cache for items, lists and stats
+
+    Entries are keyed ``(kind, table_name, ...)`` including the projection,
+    so each projection of the same read is cached separately. Writes made through this
+    service invalidate the affected entries; writes from other processes are
+    picked up once the TTL runs out.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cache = TTLCache(
+            max_size=Config.CACHE_MAX_ENTRIES, ttl=Config.CACHE_TTL_SECONDS
+        )
+        self.list_ttl = Config.CACHE_LIST_TTL_SECONDS
+
+    def invalidate_table(self, table_name, item_id=None):
+        """Drop cached lists and stats for a table (and one of its items)"""
+        if item_id is not None:
+            self.invalidate_items(table_name, [item_id])
+        self.cache.invalidate_where(
+            lambda key: key[0] == "stats"
+            or (key[0] in ("list", "all", "search", "recent") and key[1] == table_name)
+        )
+
+    def invalidate_items(self, table_name, item_ids):
+        """Drop every cached projection of the given items"""
+        item_ids = set(item_ids)
+        self.cache.invalidate_where(
+            lambda key: key[0] == "item" and key[1] == table_name and key[2] in item_ids
+        )
+
+    # Reads
+
+    def _get_item(self, table_name, item_id, projection):
+        return self.cache.get_or_load(
+            ("item", table_name, item_id, projection),
+            lambda: super(CachedDynamoDBService, self)._get_item(
+                table_name, item_id, projection
+            ),
+        )
+
+    def list_items(
+        self, table_name, limit=None, cursor=None, projection="full", order=None
+    ):
+        return self.cache.get_or_load(
+            ("list", table_name, limit, cursor, projection, order),
+            lambda: super(CachedDynamoDBService, self).list_items(
+                table_name,
+                limit=limit,
+                cursor=cursor,
+                projection=projection,
+                order=order,
+            ),
+            self.list_ttl,
+        )
+
+    def get_all_notes(self):
+        return self.cache.get_or_load(
+            ("all", "notes"), super().get_all_notes, self.list_ttl
+        )
+
+    def get_all_images(self):
+        return self.cache.get_or_load(
+            ("all", "images"), super().get_all_images, self.list_ttl
+        )
+
+    def get_all_videos(self):
+        return self.cache.get_or_load(
+            ("all", "videos"), super().get_all_videos, self.list_ttl
+        )
+
+    def search_items(self, table_name, search_term, projection="full"):
+        return self.cache.get_or_load(
+            ("search", table_name, search_term, projection),
+            lambda: super(CachedDynamoDBService, self).search_items(
+                table_name, search_term, projection
+            ),
+            self.list_ttl,
+        )
+
+    def get_recent_items(self, table_name, limit=10, projection="full"):
+        return self.cache.get_or_load(
+            ("recent", table_name, limit, projection),
+            lambda: super(CachedDynamoDBService, self).get_recent_items(
+                table_name, limit, projection
+            ),
+            self.list_ttl,
+        )
+
+    def get_stats(self):
+        return self.cache.get_or_load(("stats",), super().get_stats, self.list_ttl)
+
+    # Writes
+
+    def create_note(self, data):
+        note_id = super().create_note(data)
+        self.invalidate_table("notes")
+        return note_id
+
+    def create_image(self, data):
+        image_id = super().create_image(data)
+        self.invalidate_table("images")
+        return image_id
+
+    def create_video(self, data):
+        video_id = super().create_video(data)
+        self.invalidate_table("videos")
+        return video_id
+
+    def delete_note(self, note_id):
+        old_item = super().delete_note(note_id)
+        self.invalidate_table("notes", note_id)
+        return old_item
+
+    def delete_image(self, image_id):
+        old_item = super().delete_image(image_id)
+        self.invalidate_table("images", image_id)
+        return old_item
+
+    def delete_video(self, video_id):
+        old_item = super().delete_video(video_id)
+        self.invalidate_table("videos", video_id)
+        return old_item
+
+    def delete_items(self, table_name, item_ids):
+        result = super().delete_items(table_name, item_ids)
+        self.invalidate_items(table_name, item_ids)
+        self.invalidate_table(table_name)
+        return result
+
+    def update_item_fields(self, table_name, item_id, fields):
+        super().update_item_fields(table_name, item_id, fields)
+        self.invalidate_items(table_name, [item_id])
+
+    def update_items_fields(self, table_name, updates):
+        item_ids = []
+
+        def tracked():
+            for item_id, fields in updates:
+                item_ids.append(item_id)
+                yield item_id, fields
+
+        try:
+            return super().update_items_fields(table_name, tracked())
+        finally:
+            self.invalidate_items(table_name, item_ids)
+
+    def touch_tables(self, file_types):
+        super().touch_tables(file_types)
+        for table_name in file_types:
+            self.invalidate_table(table_name)
+
+    def set_totals(self, stats):
+        stats = super().set_totals(stats)
+        self.cache.invalidate(("stats",))
+        return stats
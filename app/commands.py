@@ -0,0 +1,184 @@
+import click
+
+
+def _run_hook(name):
+    """Run a single rebuild hook (see app.export) over every table"""
+    from app.dynamodb_service import DynamoDBService
+    from app.export import REBUILD_HOOKS, run_rebuild
+
+    db_service = DynamoDBService()
+    hook = REBUILD_HOOKS[name](db_service)
+    run_rebuild(db_service, [hook])
+    return hook
+
+
+def register_commands(app):
+    """Attach the maintenance commands to the Flask CLI"""
+
+    @app.cli.command("reconcile-stats")
+    def reconcile_stats():
+        """Recompute the per-type counters from the tables."""
+        from app.dynamodb_service import FILE_TYPES
+
+        stats = _run_hook("counters").stats
+        for file_type in FILE_TYPES:
+            click.echo(
+                f"{file_type}: {stats[f'{file_type}_count']} items, "
+                f"{stats[f'{file_type}_size']} bytes"
+            )
+
+    @app.cli.command("reindex-search")
+    def reindex_search():
+        """Rebuild the full-text search index from the tables."""
+        click.echo(f"Indexed {_run_hook('search').indexed} items")
+
+    @app.cli.command("backfill-feed")
+    def backfill_feed():
+        """Add the recent-feed index key to items that predate it."""
+        click.echo(f"Updated {_run_hook('feed').updated} items")
+
+    @app.cli.command("backfill-image-metadata")
+    @click.option("--force", is_flag=True, help="Re-probe images that have metadata.")
+    @click.option("--segments", type=int, help="Parallel scan segments.")
+    def backfill_image_metadata(force, segments):
+        """Fill dimensions and exif_data from ranged reads of each image header."""
+        from app.dynamodb_service import DynamoDBService
+        from app.s3_service import S3Service
+        from app.media_probe import probe_image_from_s3
+        from app.utils import split_image_info
+
+        db_service = DynamoDBService()
+        s3_service = S3Service()
+        skipped = 0
+
+        def probed():
+            nonlocal skipped
+            for item in db_service.parallel_scan("images", segments):
+                has_dimensions = (item.get("dimensions") or {}).get("width")
+                if item.get("exif_data") and has_dimensions and not force:
+                    continue
+
+                info = probe_image_from_s3(s3_service, item["s3_key"])
+                if info is None:
+                    click.echo(f"Skipped {item['image_id']}: unrecognised image header")
+                    skipped += 1
+                    continue
+
+                dimensions, exif_data = split_image_info(info)
+                yield item["image_id"], {
+                    "dimensions": dimensions,
+                    "exif_data": exif_data,
+                }
+
+        updated = db_service.update_items_fields("images", probed())
+        click.echo(f"Updated {updated} images, skipped {skipped}")
+
+    @app.cli.command("backfill-video-metadata")
+    @click.option("--force", is_flag=True, help="Re-probe videos that have metadata.")
+    @click.option("--segments", type=int, help="Parallel scan segments.")
+    def backfill_video_metadata(force, segments):
+        """Fill duration and resolution from ranged reads of each video's headers."""
+        from app.dynamodb_service import DynamoDBService
+        from app.s3_service import S3Service
+        from app.video_probe import RangeReader, probe_video
+        from app.utils import split_video_info
+
+        db_service = DynamoDBService()
+        s3_service = S3Service()
+        skipped = 0
+
+        def probed():
+            nonlocal skipped
+            for item in db_service.parallel_scan("videos", segments):
+                if item.get("duration") and item.get("resolution") and not force:
+                    continue
+
+                try:
+                    info = probe_video(RangeReader.from_s3(s3_service, item["s3_key"]))
+                except FileNotFoundError:
+                    info = None
+                if info is None:
+                    click.echo(
+                        f"Skipped {item['video_id']}: unrecognised video container"
+                    )
+                    skipped += 1
+                    continue
+
+                duration, resolution = split_video_info(info)
+                yield item["video_id"], {"duration": duration, "resolution": resolution}
+
+        updated = db_service.update_items_fields("videos", probed())
+        click.echo(f"Updated {updated} videos, skipped {skipped}")
+
+    @app.cli.command("export")
+    @click.option(
+        "--table",
+        "tables",
+        multiple=True,
+        type=click.Choice(["notes", "images", "videos"]),
+        help="Table to export (repeatable; default: all).",
+    )
+    @click.option(
+        "--format",
+        "fmt",
+        type=click.Choice(["ndjson", "columnar"]),
+        default="ndjson",
+        show_default=True,
+    )
+    @click.option(
+        "--output",
+        default="-",
+        help="File to write ('-' for stdout).",
+        show_default=True,
+    )
+    @click.option("--segments", type=int, help="Parallel scan segments per table.")
+    def export(tables, fmt, output, segments):
+        """Dump item metadata using parallel scans."""
+        import sys
+        from app.dynamodb_service import DynamoDBService, FILE_TYPES
+        from app.export import scan_tables, write_columnar, write_ndjson
+
+        rows = scan_tables(DynamoDBService(), tables or FILE_TYPES, segments)
+        if fmt == "ndjson":
+            if output == "-":
+                written = write_ndjson(rows, sys.stdout)
+            else:
+                with open(output, "w", encoding="utf-8") as out:
+                    written = write_ndjson(rows, out)
+        else:
+            out = sys.stdout.buffer if output == "-" else output
+            written = write_columnar(rows, out)
+        click.echo(f"Exported {written} items", err=True)
+
+    @app.cli.command("rebuild")
+    @click.option(
+        "--hook",
+        "hooks",
+        multiple=True,
+        type=click.Choice(["search", "counters", "feed"]),
+        help="Derived data to rebuild (repeatable; default: all).",
+    )
+    @click.option(
+        "--table",
+        "tables",
+        multiple=True,
+        type=click.Choice(["notes", "images", "videos"]),
+        help="Table to scan (repeatable; default: all).",
+    )
+    @click.option("--segments", type=int, help="Parallel scan segments per table.")
+    def rebuild(hooks, tables, segments):
+        """Rebuild search postings, counters and feed keys in one parallel scan."""
+        from app.dynamodb_service import DynamoDBService, FILE_TYPES
+        from app.export import REBUILD_HOOKS, run_rebuild
+
+        db_service = DynamoDBService()
+        tables = tables or FILE_TYPES
+        selected = [
+            REBUILD_HOOKS[name](db_service, tables) for name in hooks or REBUILD_HOOKS
+        ]
+        summaries, scanned, elapsed = run_rebuild(
+            db_service, selected, tables, segments
+        )
+        for summary in summaries:
+            click.echo(summary)
+        click.echo(f"Scanned {scanned} items in {elapsed:.1f}s")
@@ -1,32 +1,173 @@
-import boto3
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 from config import Config
+from app.search_index import SearchIndex
+from app.aws import get_resource, get_table
+from app.fanout import fan_out
+from app.utils import DecimalEncoder
 import uuid
+import base64
 from datetime import datetime
 from decimal import Decimal
 import json
+import heapq
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 
+# Key of the aggregate record in the counters table
+TOTALS_COUNTER_ID = "totals"
+FILE_TYPES = ("notes", "images", "videos")
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+# Every item is written to this partition of the created_at index, which
+# gives a single time-ordered "recent files" feed per table
+FEED_PARTITION = "recent"
+
+# Attributes copied onto a record only when the caller provides them
+OPTIONAL_FIELDS = (
+    "content_hash",
+    "content_addressed",
+    "thumbnails",
+    "exif_data",
+    "resolution",
+)
+
+# Attempts at re-sending the unprocessed part of a BatchWriteItem or
+# BatchGetItem call
+BATCH_WRITE_ATTEMPTS = 5
+
+# Marks the end of one segment's pages in parallel_scan
+_SCAN_DONE = object()
+
+# Partition key attribute of each item table
+ID_KEYS = {"notes": "note_id", "images": "image_id", "videos": "video_id"}
+
+# Attributes a list card renders, including what media_url() needs
+CARD_FIELDS = (
+    "title",
+    "description",
+    "original_filename",
+    "file_type",
+    "file_size",
+    "created_at",
+    "s3_key",
+    "file_url",
+)
+
+# Attributes read by each named projection besides the item ID, per table;
+# "full" reads whole items
+PROJECTIONS = {
+    "card": {
+        "notes": CARD_FIELDS,
+        "images": CARD_FIELDS + ("thumbnails",),
+        "videos": CARD_FIELDS,
+    },
+    "stats": {file_type: ("file_size",) for file_type in FILE_TYPES},
+    "full": None,
+}
+
+
+def projection_params(table_name, projection="full"):
+    """Read parameters that fetch only the attributes of a named projection
+
+    Names go through #placeholders so reserved words can be projected too.
+    Raises ValueError for an unknown projection.
+    """
+    if projection not in PROJECTIONS:
+        raise ValueError(f"Unknown projection: {projection}")
+    if PROJECTIONS[projection] is None:
+        return {}
+    names = (ID_KEYS[table_name],) + PROJECTIONS[projection][table_name]
+    return {
+        "ProjectionExpression": ", ".join(f"#{name}" for name in names),
+        "ExpressionAttributeNames": {f"#{name}": name for name in names},
+    }
+
+
+def stats_from_record(record=None):
+    """Counts, byte totals and version stamps from the totals record
+
+    Every value is zero without a record. {type}_version is bumped on each
+    write to the table and {type}_modified holds the epoch seconds of it.
+    """
+    record = record or {}
+    stats = {}
+    for file_type in FILE_TYPES:
+        for field in ("count", "size", "version", "modified"):
+            stats[f"{file_type}_{field}"] = int(record.get(f"{file_type}_{field}", 0))
+    return stats
+
+
+def _version_bump(file_types):
+    """UpdateExpression parts that bump the version stamps of some tables
+
+    Returns (ADD clauses, SET clauses, attribute names, attribute values).
+    """
+    adds, sets, names = [], [], {}
+    for file_type in file_types:
+        adds.append(f"#{file_type}_version :one")
+        sets.append(f"#{file_type}_modified = :now")
+        names[f"#{file_type}_version"] = f"{file_type}_version"
+        names[f"#{file_type}_modified"] = f"{file_type}_modified"
+    return adds, sets, names, {":one": 1, ":now": int(time.time())}
+
+
+def encode_cursor(last_evaluated_key):
+    """Turn a DynamoDB LastEvaluatedKey into an opaque, URL-safe cursor"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=DecimalEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into an ExclusiveStartKey (raises ValueError if invalid)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid pagination cursor")
+    return key
 
 
 class DynamoDBService:
     def __init__(self):
-        self.dynamodb = boto3.resource(
-            "dynamodb",
-            endpoint_url=Config.AWS_ENDPOINT_URL,
-            aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
-            region_name=Config.AWS_DEFAULT_REGION,
-        )
+        self.search_index = SearchIndex(Config.SEARCH_TABLE)
+
+    # boto3 resources are not thread-safe, so tables are looked up per thread
+
+    @property
+    def dynamodb(self):
+        return get_resource("dynamodb")
 
-        self.notes_table = self.dynamodb.Table(Config.NOTES_TABLE)
-        self.images_table = self.dynamodb.Table(Config.IMAGES_TABLE)
-        self.videos_table = self.dynamodb.Table(Config.VIDEOS_TABLE)
+    @property
+    def notes_table(self):
+        return get_table(Config.NOTES_TABLE)
+
+    @property
+    def images_table(self):
+        return get_table(Config.IMAGES_TABLE)
+
+    @property
+    def videos_table(self):
+        return get_table(Config.VIDEOS_TABLE)
+
+    @property
+    def counters_table(self):
+        return get_table(Config.COUNTERS_TABLE)
+
+    @property
+    def table_map(self):
+        return {
+            "notes": self.notes_table,
+            "images": self.images_table,
+            "videos": self.videos_table,
+        }
 
     def create_note(self, data):
         """Create a new note record"""
@@ -42,9 +183,13 @@ class DynamoDBService:
             "file_size": data.get("file_size", 0),
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
+            "feed": FEED_PARTITION,
         }
 
+        self._add_optional_fields(item, data)
         self.notes_table.put_item(Item=item)
+        self._update_totals("notes", 1, item["file_size"])
+        self.search_index.index_item("notes", note_id, item)
         return note_id
 
     def create_image(self, data):
@@ -62,9 +207,13 @@ class DynamoDBService:
             "dimensions": data.get("dimensions", {}),
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
+            "feed": FEED_PARTITION,
         }
 
+        self._add_optional_fields(item, data)
         self.images_table.put_item(Item=item)
+        self._update_totals("images", 1, item["file_size"])
+        self.search_index.index_item("images", image_id, item)
         return image_id
 
     def create_video(self, data):
@@ -82,78 +231,549 @@ class DynamoDBService:
             "duration": data.get("duration", 0),
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat(),
+            "feed": FEED_PARTITION,
         }
 
+        self._add_optional_fields(item, data)
         self.videos_table.put_item(Item=item)
+        self._update_totals("videos", 1, item["file_size"])
+        self.search_index.index_item("videos", video_id, item)
         return video_id
 
+    def _add_optional_fields(self, item, data):
+        """Copy the optional fields present in data onto a new record"""
+        for field in OPTIONAL_FIELDS:
+            if data.get(field) is not None:
+                item[field] = data[field]
+
+    def acquire_blob(self, s3_key):
+        """Add a reference to a content-addressed object; returns the new count"""
+        response = self.counters_table.update_item(
+            Key={"counter_id": f"blob#{s3_key}"},
+            UpdateExpression="ADD ref_count :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(response["Attributes"]["ref_count"])
+
+    def release_blob(self, s3_key):
+        """Drop a reference to a content-addressed object
+
+        Returns True when that was the last reference, i.e. the caller
+        should delete the object from S3.
+        """
+        key = {"counter_id": f"blob#{s3_key}"}
+        response = self.counters_table.update_item(
+            Key=key,
+            UpdateExpression="ADD ref_count :minus_one",
+            ExpressionAttributeValues={":minus_one": -1},
+            ReturnValues="UPDATED_NEW",
+        )
+        if int(response["Attributes"]["ref_count"]) > 0:
+            return False
+
+        # Only drop the counter if nobody took a new reference meanwhile
+        try:
+            self.counters_table.delete_item(
+                Key=key,
+                ConditionExpression="ref_count <= :zero",
+                ExpressionAttributeValues={":zero": 0},
+            )
+        except (
+            self.counters_table.meta.client.exceptions.ConditionalCheckFailedException
+        ):
+            return False
+        return True
+
+    def blob_refs(self, s3_key):
+        """Current reference count of a content-addressed object (0 if none)"""
+        response = self.counters_table.get_item(
+            Key={"counter_id": f"blob#{s3_key}"}, ConsistentRead=True
+        )
+        return int(response.get("Item", {}).get("ref_count", 0))
+
+    def update_item_fields(self, table_name, item_id, fields):
+        """Set some attributes on an existing record"""
+        self._set_fields(table_name, item_id, fields)
+        self.touch_tables([table_name])
+
+    def update_items_fields(self, table_name, updates):
+        """Set attributes on existing records; updates yields (item_id, fields)
+
+        Unlike update_item_fields, the table's version stamp is bumped once,
+        after the last write, so a long backfill does not rewrite the totals
+        record for every item. Returns the number of records updated.
+        """
+        updated = 0
+        try:
+            for item_id, fields in updates:
+                self._set_fields(table_name, item_id, fields)
+                updated += 1
+        finally:
+            if updated:
+                self.touch_tables([table_name])
+        return updated
+
+    def _set_fields(self, table_name, item_id, fields):
+        fields = dict(fields, updated_at=datetime.now().isoformat())
+        self.table_map[table_name].update_item(
+            Key={ID_KEYS[table_name]: item_id},
+            UpdateExpression="SET "
+            + ", ".join(f"#{name} = :{name}" for name in fields),
+            ConditionExpression=f"attribute_exists({ID_KEYS[table_name]})",
+            ExpressionAttributeNames={f"#{name}": name for name in fields},
+            ExpressionAttributeValues={
+                f":{name}": value for name, value in fields.items()
+            },
+        )
+
+    def touch_tables(self, file_types):
+        """Bump the version stamps of tables whose items changed in place"""
+        adds, sets, names, values = _version_bump(file_types)
+        self.counters_table.update_item(
+            Key={"counter_id": TOTALS_COUNTER_ID},
+            UpdateExpression=f"ADD {', '.join(adds)} SET {', '.join(sets)}",
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    def create_item(self, table_name, data):
+        """Create a record in the table for the given file type"""
+        creators = {
+            "notes": self.create_note,
+            "images": self.create_image,
+            "videos": self.create_video,
+        }
+        return creators[table_name](data)
+
+    def claim_upload(self, s3_key):
+        """Mark an uploaded object as finalized; False if it already was
+
+        The claim expires after UPLOAD_CLAIM_TTL_SECONDS through the
+        counters table's TTL on expires_at.
+        """
+        try:
+            self.counters_table.put_item(
+                Item={
+                    "counter_id": f"upload#{s3_key}",
+                    "created_at": datetime.now().isoformat(),
+                    "expires_at": int(time.time()) + Config.UPLOAD_CLAIM_TTL_SECONDS,
+                },
+                ConditionExpression="attribute_not_exists(counter_id)",
+            )
+            return True
+        except (
+            self.counters_table.meta.client.exceptions.ConditionalCheckFailedException
+        ):
+            return False
+
+    def release_upload(self, s3_key):
+        """Drop the claim on an upload whose record could not be written"""
+        self.counters_table.delete_item(Key={"counter_id": f"upload#{s3_key}"})
+
+    def _scan_all(self, table, **scan_kwargs):
+        """Scan every page of a table, following LastEvaluatedKey"""
+        items = []
+        while True:
+            response = table.scan(**scan_kwargs)
+            items.extend(response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return items
+            scan_kwargs["ExclusiveStartKey"] = last_key
+
+    def parallel_scan(self, table_name, segments=None, **scan_kwargs):
+        """Yield every item of a table, scanning its segments on parallel threads
+
+        Each worker pages through one Segment of a DynamoDB parallel scan and
+        hands pages over through a bounded queue, so memory stays flat and a
+        slow consumer holds the workers back. Items arrive in no particular
+        order.
+        """
+        segments = segments or Config.SCAN_SEGMENTS
+        pages = queue.Queue(maxsize=segments * 2)
+        stop = threading.Event()
+
+        def scan_segment(segment):
+            table = self.table_map[table_name]
+            kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=segments)
+            try:
+                while not stop.is_set():
+                    response = table.scan(**kwargs)
+                    pages.put(response.get("Items", []))
+                    last_key = response.get("LastEvaluatedKey")
+                    if not last_key:
+                        break
+                    kwargs["ExclusiveStartKey"] = last_key
+            except Exception as e:
+                pages.put(e)
+            finally:
+                pages.put(_SCAN_DONE)
+
+        with ThreadPoolExecutor(
+            max_workers=segments, thread_name_prefix="scan"
+        ) as executor:
+            for segment in range(segments):
+                executor.submit(scan_segment, segment)
+
+            finished = 0
+            try:
+                while finished < segments:
+                    page = pages.get()
+                    if page is _SCAN_DONE:
+                        finished += 1
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield from page
+            finally:
+                # Unblock workers still waiting to hand over a page
+                stop.set()
+                while finished < segments:
+                    if pages.get() is _SCAN_DONE:
+                        finished += 1
+
+    def list_items(
+        self, table_name, limit=None, cursor=None, projection="full", order=None
+    ):
+        """Get one page of items and the cursor for the next page
+
+        With order "newest" or "oldest" the page comes from the created_at
+        index, so paging walks the whole table in date order; otherwise it
+        is a scan page in no particular order. Cursors of one order are not
+        valid for another.
+        """
+        table = self.table_map.get(table_name)
+        if not table:
+            return [], None
+
+        limit = min(limit or Config.PAGE_SIZE, Config.MAX_PAGE_SIZE)
+        kwargs = {
+            "Limit": max(limit, 1),
+            **projection_params(table_name, projection),
+        }
+        if cursor:
+            kwargs["ExclusiveStartKey"] = decode_cursor(cursor)
+
+        if order in ("newest", "oldest"):
+            response = table.query(
+                IndexName=Config.RECENT_INDEX,
+                KeyConditionExpression=Key("feed").eq(FEED_PARTITION),
+                ScanIndexForward=order == "oldest",
+                **kwargs,
+            )
+        else:
+            response = table.scan(**kwargs)
+        return response.get("Items", []), encode_cursor(
+            response.get("LastEvaluatedKey")
+        )
+
+    def iter_pages(self, table_name, cursor=None, projection="full"):
+        """Lazily yield every page of a table's scan, starting at cursor
+
+        Pages are as large as DynamoDB returns them (up to 1 MB). The cursor
+        is checked up front, so an invalid one raises ValueError here rather
+        than halfway through iteration.
+        """
+        scan_kwargs = projection_params(table_name, projection)
+        if cursor:
+            scan_kwargs["ExclusiveStartKey"] = decode_cursor(cursor)
+        return self._pages(self.table_map[table_name], scan_kwargs)
+
+    @staticmethod
+    def _pages(table, scan_kwargs):
+        while True:
+            response = table.scan(**scan_kwargs)
+            yield response.get("Items", [])
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return
+            scan_kwargs["ExclusiveStartKey"] = last_key
+
     def get_all_notes(self):
         """Get all notes"""
-        response = self.notes_table.scan()
-        return response.get("Items", [])
+        return self._scan_all(self.notes_table)
 
     def get_all_images(self):
         """Get all images"""
-        response = self.images_table.scan()
-        return response.get("Items", [])
+        return self._scan_all(self.images_table)
 
     def get_all_videos(self):
         """Get all videos"""
-        response = self.videos_table.scan()
+        return self._scan_all(self.videos_table)
+
+    def get_recent_items(self, table_name, limit=10, projection="full"):
+        """Get the newest items of one table from the created_at index"""
+        table = self.table_map.get(table_name)
+        if not table:
+            return []
+
+        # The index projects ALL attributes, and created_at is needed to merge
+        params = projection_params(table_name, projection)
+        if params and "#created_at" not in params["ExpressionAttributeNames"]:
+            params["ProjectionExpression"] += ", #created_at"
+            params["ExpressionAttributeNames"]["#created_at"] = "created_at"
+        response = table.query(
+            IndexName=Config.RECENT_INDEX,
+            KeyConditionExpression=Key("feed").eq(FEED_PARTITION),
+            ScanIndexForward=False,
+            Limit=limit,
+            **params,
+        )
         return response.get("Items", [])
 
-    def get_note_by_id(self, note_id):
-        """Get a specific note by ID"""
-        response = self.notes_table.get_item(Key={"note_id": note_id})
+    def get_recent_feed(self, limit=10, projection="full"):
+        """Get the newest items across all tables as (file_type, item) pairs
+
+        The tables are queried concurrently; a table that fails or times out
+        is left out of the feed. Returns (feed, whether every table was read).
+        """
+        feeds, errors = fan_out(self._recent_calls(limit, projection))
+        return self._merge_recent(feeds, limit), not errors
+
+    def _recent_calls(self, limit, projection):
+        return {
+            file_type: partial(self.get_recent_items, file_type, limit, projection)
+            for file_type in FILE_TYPES
+        }
+
+    @staticmethod
+    def _merge_recent(feeds_by_type, limit):
+        feeds = [
+            [(item.get("created_at", ""), file_type, item) for item in items]
+            for file_type, items in feeds_by_type.items()
+        ]
+
+        # Each feed is already newest-first, so a k-way merge is enough
+        merged = heapq.merge(*feeds, key=lambda entry: entry[0], reverse=True)
+        return [(file_type, item) for _, file_type, item in islice(merged, limit)]
+
+    def _get_item(self, table_name, item_id, projection):
+        response = self.table_map[table_name].get_item(
+            Key={ID_KEYS[table_name]: item_id},
+            **projection_params(table_name, projection),
+        )
         return response.get("Item")
 
-    def get_image_by_id(self, image_id):
+    def get_note_by_id(self, note_id, projection="full"):
+        """Get a specific note by ID"""
+        return self._get_item("notes", note_id, projection)
+
+    def get_image_by_id(self, image_id, projection="full"):
         """Get a specific image by ID"""
-        response = self.images_table.get_item(Key={"image_id": image_id})
-        return response.get("Item")
+        return self._get_item("images", image_id, projection)
 
-    def get_video_by_id(self, video_id):
+    def get_video_by_id(self, video_id, projection="full"):
         """Get a specific video by ID"""
-        response = self.videos_table.get_item(Key={"video_id": video_id})
-        return response.get("Item")
+        return self._get_item("videos", video_id, projection)
 
     def delete_note(self, note_id):
-        """Delete a note by ID"""
-        self.notes_table.delete_item(Key={"note_id": note_id})
+        """Delete a note by ID and return the removed record (or None)"""
+        response = self.notes_table.delete_item(
+            Key={"note_id": note_id}, ReturnValues="ALL_OLD"
+        )
+        self._on_deleted("notes", response.get("Attributes"))
+        return response.get("Attributes")
 
     def delete_image(self, image_id):
-        """Delete an image by ID"""
-        self.images_table.delete_item(Key={"image_id": image_id})
+        """Delete an image by ID and return the removed record (or None)"""
+        response = self.images_table.delete_item(
+            Key={"image_id": image_id}, ReturnValues="ALL_OLD"
+        )
+        self._on_deleted("images", response.get("Attributes"))
+        return response.get("Attributes")
 
     def delete_video(self, video_id):
-        """Delete a video by ID"""
-        self.videos_table.delete_item(Key={"video_id": video_id})
+        """Delete a video by ID and return the removed record (or None)"""
+        response = self.videos_table.delete_item(
+            Key={"video_id": video_id}, ReturnValues="ALL_OLD"
+        )
+        self._on_deleted("videos", response.get("Attributes"))
+        return response.get("Attributes")
 
-    def search_items(self, table_name, search_term):
-        """Search items by title or description"""
-        table_map = {
-            "notes": self.notes_table,
-            "images": self.images_table,
-            "videos": self.videos_table,
-        }
+    def delete_items(self, table_name, item_ids):
+        """Delete many items of one table with batched reads and writes
+
+        Returns (deleted, not_found, failed): the removed records, the IDs
+        that did not exist and the IDs DynamoDB did not delete. Totals and
+        search postings are updated once for the whole batch. Unlike the
+        single deletes this cannot see concurrent deletes of the same items;
+        reconcile-stats corrects the totals if that happens.
+        """
+        table = self.table_map[table_name]
+        id_key = ID_KEYS[table_name]
+        item_ids = list(dict.fromkeys(item_ids))
+        items = self._batch_get(table_name, item_ids)
+        found = {item[id_key] for item in items}
+        not_found = [item_id for item_id in item_ids if item_id not in found]
+
+        failed = set()
+        # BatchWriteItem accepts at most 25 requests per call
+        for start in range(0, len(items), 25):
+            request = {
+                table.name: [
+                    {"DeleteRequest": {"Key": {id_key: item[id_key]}}}
+                    for item in items[start : start + 25]
+                ]
+            }
+            for attempt in range(BATCH_WRITE_ATTEMPTS):
+                try:
+                    response = self.dynamodb.batch_write_item(RequestItems=request)
+                except ClientError as e:
+                    print(f"Error deleting batch from {table_name}: {e}")
+                    break
+                request = response.get("UnprocessedItems")
+                if not request:
+                    break
+                time.sleep(0.05 * 2**attempt)
+            if request:
+                failed.update(
+                    entry["DeleteRequest"]["Key"][id_key]
+                    for entry in request[table.name]
+                )
+
+        deleted = [item for item in items if item[id_key] not in failed]
+        if deleted:
+            self._update_totals(
+                table_name,
+                -len(deleted),
+                -sum(item.get("file_size", 0) for item in deleted),
+            )
+            self.search_index.remove_items(
+                table_name, [(item[id_key], item) for item in deleted]
+            )
+        return deleted, not_found, [i for i in item_ids if i in failed]
+
+    def _on_deleted(self, table_name, old_item):
+        """Keep derived records in sync after an item was removed"""
+        if not old_item:
+            # Nothing was deleted, so there is nothing to decrement
+            return
+        self._update_totals(table_name, -1, -old_item.get("file_size", 0))
+        self.search_index.remove_item(
+            table_name, old_item[ID_KEYS[table_name]], old_item
+        )
+
+    def _update_totals(self, table_name, count_delta, size_delta):
+        """Atomically adjust the count and byte total for one file type
+
+        The table's version stamp is bumped in the same update.
+        """
+        adds, sets, names, values = _version_bump([table_name])
+        self.counters_table.update_item(
+            Key={"counter_id": TOTALS_COUNTER_ID},
+            UpdateExpression=f"ADD #count :count, #size :size, {', '.join(adds)} "
+            f"SET {', '.join(sets)}",
+            ExpressionAttributeNames={
+                "#count": f"{table_name}_count",
+                "#size": f"{table_name}_size",
+                **names,
+            },
+            ExpressionAttributeValues={
+                ":count": count_delta,
+                ":size": Decimal(str(size_delta or 0)),
+                **values,
+            },
+        )
+
+    def get_stats(self):
+        """Get item counts and byte totals for every file type"""
+        response = self.counters_table.get_item(Key={"counter_id": TOTALS_COUNTER_ID})
+        return stats_from_record(response.get("Item"))
+
+    def set_totals(self, stats):
+        """Overwrite the counts and byte totals in the totals record
+
+        The version stamps of the affected tables are bumped, since pages
+        showing the old counts are out of date.
+        """
+        file_types = [t for t in FILE_TYPES if f"{t}_count" in stats]
+        adds, sets, names, values = _version_bump(file_types)
+        # SET only the counter attributes so other fields on the record survive
+        sets = [f"#{key} = :{key}" for key in stats] + sets
+        expression = "SET " + ", ".join(sets)
+        if adds:
+            expression += " ADD " + ", ".join(adds)
+        else:
+            values = {}
+        self.counters_table.update_item(
+            Key={"counter_id": TOTALS_COUNTER_ID},
+            UpdateExpression=expression,
+            ExpressionAttributeNames={
+                **{f"#{key}": key for key in stats},
+                **names,
+            },
+            ExpressionAttributeValues={
+                **{f":{key}": value for key, value in stats.items()},
+                **values,
+            },
+        )
+        return stats
+
+    def _batch_get(self, table_name, item_ids, projection="full"):
+        """Fetch items by ID with batch_get_item, keeping the given order
+
+        Unprocessed keys are re-sent with exponential backoff; RuntimeError
+        is raised if some are still left after BATCH_WRITE_ATTEMPTS calls.
+        """
+        table = self.table_map[table_name]
+        id_key = ID_KEYS[table_name]
+        params = projection_params(table_name, projection)
+        found = {}
 
-        table = table_map.get(table_name)
+        # BatchGetItem accepts at most 100 keys per call
+        for start in range(0, len(item_ids), 100):
+            request = {
+                table.name: {
+                    "Keys": [
+                        {id_key: item_id} for item_id in item_ids[start : start + 100]
+                    ],
+                    **params,
+                }
+            }
+            for attempt in range(BATCH_WRITE_ATTEMPTS):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(table.name, []):
+                    found[item[id_key]] = item
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+                time.sleep(0.05 * 2**attempt)
+            if request:
+                # Reporting the keys as missing would be wrong, so give up
+                raise RuntimeError(
+                    f"{len(request[table.name]['Keys'])} keys of {table_name} "
+                    f"still unprocessed after {BATCH_WRITE_ATTEMPTS} attempts"
+                )
+
+        # IDs still in the index but no longer in the table are dropped
+        return [found[item_id] for item_id in item_ids if item_id in found]
+
+    def search_items(self, table_name, search_term, projection="full"):
+        """Search items by title, description or filename using the search index"""
+        table = self.table_map.get(table_name)
         if not table:
             return []
 
-        # Scan is simple but not efficient for large datasets
-        # In production, consider using ElasticSearch or DynamoDB streams
-        response = table.scan()
-        items = response.get("Items", [])
-
-        if search_term:
-            search_term = search_term.lower()
-            filtered_items = []
-            for item in items:
-                title = item.get("title", "").lower()
-                description = item.get("description", "").lower()
-                if search_term in title or search_term in description:
-                    filtered_items.append(item)
-            return filtered_items
-
-        return items
+        if not search_term:
+            return self._scan_all(table, **projection_params(table_name, projection))
+
+        item_ids = self.search_index.search(
+            table_name, search_term, limit=Config.SEARCH_RESULT_LIMIT
+        )
+        return self._batch_get(table_name, item_ids, projection)
+
+    def search_all(self, search_term, projection="full"):
+        """Search every table concurrently; returns {file_type: items}
+
+        Tables that fail or time out contribute no results.
+        """
+        results, _ = fan_out(
+            {
+                file_type: partial(
+                    self.search_items, file_type, search_term, projection
+                )
+                for file_type in FILE_TYPES
+            }
+        )
+        return {file_type: results.get(file_type, []) for file_type in FILE_TYPES}
@@ -0,0 +1,185 @@
+import gzip
+import json
+import time
+from app.utils import json_default
+from app.dynamodb_service import (
+    FEED_PARTITION,
+    FILE_TYPES,
+    ID_KEYS,
+    projection_params,
+)
+
+
+def scan_tables(db_service, tables=FILE_TYPES, segments=None, projection="full"):
+    """Yield (file_type, item) for every item of the given tables
+
+    Each table is read with a parallel scan, so throughput is bound by
+    DynamoDB and the consumer rather than by a single scanning thread.
+    """
+    for file_type in tables:
+        for item in db_service.parallel_scan(
+            file_type, segments=segments, **projection_params(file_type, projection)
+        ):
+            yield file_type, item
+
+
+def _dumps(value):
+    return json.dumps(value, default=json_default, separators=(",", ":"))
+
+
+def write_ndjson(rows, out):
+    """Write one JSON object per line: the item plus the "table" it came from"""
+    written = 0
+    for file_type, item in rows:
+        out.write(_dumps({"table": file_type, **item}) + "\n")
+        written += 1
+    return written
+
+
+def write_columnar(rows, out, row_group_size=10000):
+    """Write a gzip file of column-oriented row groups
+
+    Every line of the (decompressed) output is one row group of a single
+    table: {"table", "rows", "columns": {name: [values...]}}, where all
+    columns have "rows" entries and missing attributes are null. Attribute
+    names are stored once per group instead of once per item, which with
+    gzip makes the export several times smaller than NDJSON.
+    """
+    written = 0
+    groups = {}
+    with gzip.open(out, "wt", encoding="utf-8") as stream:
+
+        def flush(file_type):
+            group = groups.pop(file_type)
+            names = sorted({name for item in group for name in item})
+            columns = {name: [item.get(name) for item in group] for name in names}
+            stream.write(
+                _dumps({"table": file_type, "rows": len(group), "columns": columns})
+                + "\n"
+            )
+
+        for file_type, item in rows:
+            group = groups.setdefault(file_type, [])
+            group.append(item)
+            written += 1
+            if len(group) >= row_group_size:
+                flush(file_type)
+        for file_type in list(groups):
+            flush(file_type)
+    return written
+
+
+class RebuildHook:
+    """Consumer of a full scan: begin(), add() for every item, then end()"""
+
+    # Named projection (see dynamodb_service.PROJECTIONS) of the items add() reads
+    projection = "full"
+
+    def begin(self):
+        pass
+
+    def add(self, file_type, item):
+        raise NotImplementedError
+
+    def end(self):
+        """Finish the rebuild and return a one-line summary"""
+        raise NotImplementedError
+
+
+class SearchIndexHook(RebuildHook):
+    """Rebuilds the search index from scratch"""
+
+    def __init__(self, db_service, tables=FILE_TYPES, batch_size=500):
+        self.search_index = db_service.search_index
+        self.tables = tables
+        self.batch_size = batch_size
+        self.pending = {}
+        self.indexed = 0
+
+    def begin(self):
+        self.search_index.clear(self.tables)
+
+    def add(self, file_type, item):
+        batch = self.pending.setdefault(file_type, [])
+        batch.append((item[ID_KEYS[file_type]], item))
+        if len(batch) >= self.batch_size:
+            self._flush(file_type)
+
+    def _flush(self, file_type):
+        self.indexed += self.search_index.index_items(
+            file_type, self.pending.pop(file_type)
+        )
+
+    def end(self):
+        for file_type in list(self.pending):
+            self._flush(file_type)
+        return f"search: indexed {self.indexed} items"
+
+
+class CountersHook(RebuildHook):
+    """Recomputes the per-type counts and byte totals"""
+
+    projection = "stats"
+
+    def __init__(self, db_service, tables=FILE_TYPES):
+        self.db_service = db_service
+        self.stats = {}
+        for file_type in tables:
+            self.stats[f"{file_type}_count"] = 0
+            self.stats[f"{file_type}_size"] = 0
+
+    def add(self, file_type, item):
+        self.stats[f"{file_type}_count"] += 1
+        self.stats[f"{file_type}_size"] += int(item.get("file_size", 0))
+
+    def end(self):
+        self.db_service.set_totals(self.stats)
+        return "counters: " + ", ".join(f"{k}={v}" for k, v in self.stats.items())
+
+
+class FeedHook(RebuildHook):
+    """Adds the recent-feed index key to items that predate it"""
+
+    def __init__(self, db_service, tables=FILE_TYPES):
+        self.db_service = db_service
+        self.updated = 0
+
+    def add(self, file_type, item):
+        if item.get("feed") == FEED_PARTITION:
+            return
+        self.db_service.table_map[file_type].update_item(
+            Key={ID_KEYS[file_type]: item[ID_KEYS[file_type]]},
+            UpdateExpression="SET feed = :feed",
+            ExpressionAttributeValues={":feed": FEED_PARTITION},
+        )
+        self.updated += 1
+
+    def end(self):
+        return f"feed: updated {self.updated} items"
+
+
+REBUILD_HOOKS = {
+    "search": SearchIndexHook,
+    "counters": CountersHook,
+    "feed": FeedHook,
+}
+
+
+def run_rebuild(db_service, hooks, tables=FILE_TYPES, segments=None):
+    """Feed one parallel scan of the tables into every hook
+
+    Returns (summaries, items scanned, seconds taken). Whole items are read
+    unless every hook asks for the same smaller projection.
+    """
+    projections = {hook.projection for hook in hooks}
+    projection = projections.pop() if len(projections) == 1 else "full"
+    for hook in hooks:
+        hook.begin()
+    scanned = 0
+    started = time.monotonic()
+    for file_type, item in scan_tables(db_service, tables, segments, projection):
+        for hook in hooks:
+            hook.add(file_type, item)
+        scanned += 1
+    summaries = [hook.end() for hook in hooks]
+    return summaries, scanned, time.monotonic() - started
@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import Config
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.FANOUT_MAX_WORKERS, thread_name_prefix="fanout"
+            )
+        return _executor
+
+
+def fan_out(calls, timeout=None):
+    """Run independent calls concurrently and collect the ones that finished
+
+    calls maps a name to a zero-argument callable. Returns (results, errors):
+    results holds the return value of every call that completed within the
+    timeout, errors the exception raised by the others (TimeoutError for
+    calls still running at the deadline). The calls must not fan out again
+    themselves, since they share one bounded pool.
+    """
+    timeout = Config.FANOUT_TIMEOUT_SECONDS if timeout is None else timeout
+    futures = {_get_executor().submit(call): name for name, call in calls.items()}
+    done, pending = wait(futures, timeout=timeout)
+
+    results, errors = {}, {}
+    for future in done:
+        name = futures[future]
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            print(f"Error in concurrent call {name}: {e}")
+            errors[name] = e
+    for future in pending:
+        name = futures[future]
+        future.cancel()
+        print(f"Concurrent call {name} timed out after {timeout}s")
+        errors[name] = TimeoutError(f"{name} timed out")
+    return results, errors
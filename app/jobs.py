@@ -0,0 +1,273 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    heartbeat_at REAL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+# Columns added after the first release, for databases created before them
+ADDED_COLUMNS = (("owner", "TEXT"), ("heartbeat_at", "REAL"))
+
+
+class JobQueue:
+    """Background jobs run on a bounded thread pool, persisted in SQLite
+
+    Every job is a row in a local SQLite table, so its status survives
+    restarts and can be polled through /api/jobs/<id>. A worker claims a
+    queued row atomically before running it, which keeps several processes
+    sharing one database from running the same job twice. Failed attempts
+    are retried with exponential backoff up to max_attempts.
+
+    Nothing runs until start(), which web workers call; CLI processes never
+    pick up jobs. A started queue heartbeats the jobs it is running every
+    sweep_interval seconds and sweeps the table: jobs whose owner stopped
+    heartbeating for stale_after seconds (a crash or redeploy) are queued
+    again, and due jobs whose retry timer died with another process are
+    scheduled.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        max_workers=2,
+        max_attempts=5,
+        retry_backoff=2.0,
+        stale_after=60,
+        sweep_interval=15,
+    ):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        self.handlers = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="jobs"
+        )
+        # Jobs handed to the executor or a retry timer and not yet started
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, declaration in ADDED_COLUMNS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection that commits on success and always closes"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, kind):
+        """Decorator registering handler(payload) -> result for a job kind"""
+
+        def decorator(handler):
+            self.handlers[kind] = handler
+            return handler
+
+        return decorator
+
+    def submit(self, kind, payload):
+        """Persist a new job and schedule it; returns its job_id"""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind: {kind}")
+
+        self.start()
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, payload, status, created_at,"
+                " updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Status record of a job, or None if it does not exist"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["job_id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def counts(self):
+        """Number of jobs in each status"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def start(self):
+        """Start heartbeating and sweeping in this process (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.resume()
+        thread = threading.Thread(
+            target=self._maintain, name="jobs-sweeper", daemon=True
+        )
+        thread.start()
+
+    def _maintain(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self._heartbeat()
+                self.resume()
+            except Exception as e:
+                print(f"Job sweep failed: {e}")
+
+    def _heartbeat(self):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                (time.time(), self.owner),
+            )
+
+    def resume(self):
+        """Requeue jobs whose owner stopped heartbeating and schedule due ones
+
+        Returns the number of queued jobs scheduled by this sweep.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, run_after = 0"
+                " WHERE status = 'running' AND COALESCE(heartbeat_at, 0) < ?",
+                (now - self.stale_after,),
+            )
+            rows = conn.execute(
+                "SELECT job_id, run_after FROM jobs WHERE status = 'queued'"
+            ).fetchall()
+        scheduled = 0
+        for job_id, run_after in rows:
+            with self._lock:
+                if job_id in self._pending:
+                    continue
+            self._schedule(job_id, max(0.0, run_after - now))
+            scheduled += 1
+        return scheduled
+
+    def _schedule(self, job_id, delay=0.0):
+        with self._lock:
+            self._pending.add(job_id)
+        if delay <= 0:
+            self._executor.submit(self._run, job_id)
+            return
+        # Retries wait on a timer so they do not hold a worker thread
+        timer = threading.Timer(delay, self._executor.submit, (self._run, job_id))
+        timer.daemon = True
+        timer.start()
+
+    def _claim(self, job_id):
+        """Mark a due queued job running; returns its row, or None if taken"""
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " owner = ?, heartbeat_at = ?, updated_at = ?"
+                " WHERE job_id = ? AND status = 'queued' AND run_after <= ?",
+                (self.owner, time.time(), now, job_id, time.time()),
+            ).rowcount
+            if not claimed:
+                return None
+            return conn.execute(
+                "SELECT kind, payload, attempts FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+
+    def _finish(self, job_id, status, result=None, error=None, run_after=0.0):
+        """Record the outcome; False if the job was requeued to another owner"""
+        with self._connect() as conn:
+            return bool(
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?,"
+                    " run_after = ?, owner = NULL, updated_at = ?"
+                    " WHERE job_id = ? AND owner = ?",
+                    (
+                        status,
+                        json.dumps(result, default=str) if result is not None else None,
+                        error,
+                        run_after,
+                        datetime.now().isoformat(),
+                        job_id,
+                        self.owner,
+                    ),
+                ).rowcount
+            )
+
+    def _run(self, job_id):
+        with self._lock:
+            self._pending.discard(job_id)
+        row = self._claim(job_id)
+        if row is None:
+            return
+
+        try:
+            result = self.handlers[row["kind"]](json.loads(row["payload"]))
+        except Exception as e:
+            print(f"Job {job_id} ({row['kind']}) failed: {traceback.format_exc()}")
+            if row["attempts"] >= self.max_attempts:
+                self._finish(job_id, "failed", error=str(e))
+                return
+            delay = self.retry_backoff * 2 ** (row["attempts"] - 1)
+            if self._finish(
+                job_id, "queued", error=str(e), run_after=time.time() + delay
+            ):
+                self._schedule(job_id, delay)
+            return
+
+        self._finish(job_id, "succeeded", result=result)
@@ -0,0 +1,177 @@
+import struct
+
+# EXIF/TIFF tags copied into Image.exif_data
+EXIF_TAGS = {271: "make", 272: "model", 274: "orientation", 306: "datetime"}
+
+# JPEG start-of-frame markers (everything in C0-CF except DHT, JPG and DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def probe_image(data):
+    """Read format, size and EXIF orientation from the first bytes of an image
+
+    Supports PNG, JPEG, GIF, WebP, BMP and TIFF. Returns a dict such as
+    {"format": "jpeg", "width": 4032, "height": 3024, "orientation": 6} or
+    None when the format is unknown or the header is not in ``data`` yet
+    (e.g. a JPEG whose EXIF block is larger than the bytes read so far).
+    """
+    try:
+        if data.startswith(b"\x89PNG\r\n\x1a\n"):
+            return _probe_png(data)
+        if data.startswith(b"\xff\xd8"):
+            return _probe_jpeg(data)
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            width, height = struct.unpack_from("<HH", data, 6)
+            return _result("gif", width, height)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return _probe_webp(data)
+        if data.startswith(b"BM"):
+            return _probe_bmp(data)
+        if data[:4] in (b"II*\x00", b"MM\x00*"):
+            return _probe_tiff(data)
+    except (struct.error, IndexError, ValueError):
+        # Header cut off before the fields we need
+        return None
+    return None
+
+
+def probe_image_prefix(read_prefix, initial_bytes=64 * 1024, max_bytes=None):
+    """Probe an image through read_prefix(length), which returns its first bytes
+
+    Starts with initial_bytes and doubles the range (up to max_bytes) only
+    when the header did not fit, e.g. JPEGs with large EXIF or ICC segments
+    or embedded previews before the frame header.
+    """
+    max_bytes = max_bytes or 16 * initial_bytes
+    length = initial_bytes
+    while True:
+        data = read_prefix(length)
+        info = probe_image(data)
+        if info or len(data) < length or length >= max_bytes:
+            return info
+        length = min(length * 2, max_bytes)
+
+
+def probe_image_from_s3(s3_service, s3_key, initial_bytes=64 * 1024, max_bytes=None):
+    """Probe an image stored in S3 using ranged reads of its first bytes"""
+    return probe_image_prefix(
+        lambda length: s3_service.read_range(s3_key, 0, length),
+        initial_bytes,
+        max_bytes,
+    )
+
+
+def _result(fmt, width, height, tags=None):
+    info = {"format": fmt, "width": int(width), "height": int(height)}
+    info["orientation"] = 1
+    info.update(tags or {})
+    return info
+
+
+def _probe_png(data):
+    if data[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack_from(">II", data, 16)
+    return _result("png", width, height)
+
+
+def _probe_jpeg(data):
+    tags = {}
+    offset = 2
+    while offset < len(data):
+        if data[offset] != 0xFF:
+            raise ValueError("Corrupt JPEG marker")
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before the real marker
+            offset += 1
+            continue
+        if marker in (0x01, *range(0xD0, 0xD8)):
+            # Standalone markers have no length
+            offset += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image / start of scan without a frame header
+            return None
+
+        (length,) = struct.unpack_from(">H", data, offset + 2)
+        segment = offset + 4
+        if marker == 0xE1 and data[segment : segment + 6] == b"Exif\x00\x00":
+            if offset + 2 + length > len(data):
+                raise ValueError("EXIF block cut off")
+            try:
+                tags = _read_tiff_tags(data[segment + 6 : offset + 2 + length])
+            except (struct.error, IndexError, ValueError):
+                # Malformed EXIF should not hide the frame size
+                tags = {}
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack_from(">HH", data, segment + 1)
+            return _result("jpeg", width, height, tags)
+        offset += 2 + length
+    return None
+
+
+def _probe_webp(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        # Key frame: 3-byte frame tag, start code, then 14-bit sizes
+        width, height = struct.unpack_from("<HH", data, 26)
+        return _result("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        (bits,) = struct.unpack_from("<I", data, 21)
+        return _result("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        if len(data) < 30:
+            return None
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return _result("webp", width, height)
+    return None
+
+
+def _probe_bmp(data):
+    (header_size,) = struct.unpack_from("<I", data, 14)
+    if header_size == 12:
+        width, height = struct.unpack_from("<HH", data, 18)
+    else:
+        width, height = struct.unpack_from("<ii", data, 18)
+    # Negative height means a top-down bitmap
+    return _result("bmp", width, abs(height))
+
+
+def _probe_tiff(data):
+    tags = _read_tiff_tags(data, wanted={256: "width", 257: "height", **EXIF_TAGS})
+    if "width" not in tags or "height" not in tags:
+        return None
+    width = tags.pop("width")
+    height = tags.pop("height")
+    return _result("tiff", width, height, tags)
+
+
+def _read_tiff_tags(data, wanted=EXIF_TAGS):
+    """Read SHORT/LONG/ASCII values of wanted tags from a TIFF IFD0"""
+    byte_order = "<" if data[:2] == b"II" else ">"
+    (ifd_offset,) = struct.unpack_from(byte_order + "I", data, 4)
+    (entry_count,) = struct.unpack_from(byte_order + "H", data, ifd_offset)
+
+    tags = {}
+    for index in range(entry_count):
+        entry = ifd_offset + 2 + index * 12
+        tag, value_type, count = struct.unpack_from(byte_order + "HHI", data, entry)
+        if tag not in wanted:
+            continue
+        if value_type == 3:  # SHORT
+            (value,) = struct.unpack_from(byte_order + "H", data, entry + 8)
+        elif value_type == 4:  # LONG
+            (value,) = struct.unpack_from(byte_order + "I", data, entry + 8)
+        elif value_type == 2:  # ASCII, stored inline when it fits in 4 bytes
+            if count <= 4:
+                raw = data[entry + 8 : entry + 8 + count]
+            else:
+                (value_offset,) = struct.unpack_from(byte_order + "I", data, entry + 8)
+                raw = data[value_offset : value_offset + count]
+            value = raw.split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+        else:
+            continue
+        tags[wanted[tag]] = value
+    return tags
@@ -0,0 +1,270 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from config import Config
+
+try:
+    from botocore.utils import determine_content_length
+except ImportError:  # botocore < 1.20
+
+    def determine_content_length(body):
+        return len(body) if hasattr(body, "__len__") else None
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# DynamoDB operations whose consumed capacity counts as reads
+READ_OPERATIONS = {"GetItem", "BatchGetItem", "Query", "Scan", "TransactGetItems"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    """One line of the Prometheus text format"""
+    if labels:
+        pairs = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+        return f"{name}{{{pairs}}} {value}"
+    return f"{name} {value}"
+
+
+class Counter:
+    """Monotonically increasing value per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield _sample(self.name, list(zip(self.labelnames, key)), value)
+
+
+class Histogram:
+    """Distribution of observed values (e.g. latencies) per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (key, list(counts), total)
+                for key, (counts, total) in self._values.items()
+            )
+        for key, counts, total in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield _sample(
+                    f"{self.name}_bucket", labels + [("le", bound)], cumulative
+                )
+            yield _sample(f"{self.name}_sum", labels, total)
+            yield _sample(f"{self.name}_count", labels, cumulative)
+
+
+class Registry:
+    """Named set of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time to produce a response, excluding streamed bodies",
+    ("route", "method"),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Responses sent", ("route", "method", "status")
+)
+HTTP_ERRORS = REGISTRY.counter(
+    "http_request_errors_total", "Responses with a 5xx status", ("route", "method")
+)
+AWS_LATENCY = REGISTRY.histogram(
+    "aws_call_duration_seconds",
+    "Time of an AWS API call including retries",
+    ("service", "operation"),
+)
+AWS_ERRORS = REGISTRY.counter(
+    "aws_call_errors_total",
+    "AWS API calls that failed, by error code",
+    ("service", "operation", "code"),
+)
+AWS_BYTES = REGISTRY.counter(
+    "aws_transfer_bytes_total",
+    "Request and response body bytes of AWS API calls",
+    ("service", "operation", "direction"),
+)
+DYNAMODB_CAPACITY = REGISTRY.counter(
+    "dynamodb_consumed_capacity_units_total",
+    "Capacity units consumed per table",
+    ("table", "kind"),
+)
+
+
+# Flask request hooks
+
+
+def init_app(app):
+    """Time every request of the app (when METRICS_ENABLED)"""
+    if not Config.METRICS_ENABLED:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    # The URL rule rather than the path keeps item IDs out of the labels
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    HTTP_LATENCY.observe(
+        time.perf_counter() - started, route=route, method=request.method
+    )
+    HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        HTTP_ERRORS.inc(route=route, method=request.method)
+    return response
+
+
+# botocore event hooks
+
+
+def instrument_client(client):
+    """Record latency, errors, transfer bytes and DynamoDB capacity of a client
+
+    Hooks the client's botocore event system; before-call and after-call
+    share the request context, which carries the start time between them.
+    """
+    if not Config.METRICS_ENABLED:
+        return
+    events = client.meta.events
+    if client.meta.service_model.service_name == "dynamodb":
+        events.register("before-parameter-build.dynamodb", _request_capacity)
+    events.register("before-call", _before_call)
+    events.register("after-call", _after_call)
+    events.register("after-call-error", _after_call_error)
+
+
+def _request_capacity(params, model, **kwargs):
+    # Capacity is only reported when asked for
+    if "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _before_call(model, params, context, **kwargs):
+    service = model.service_model.service_name
+    context["metrics_call"] = (service, model.name, time.perf_counter())
+    body = params.get("body")
+    if body:
+        sent = determine_content_length(body)
+        if sent:
+            AWS_BYTES.inc(sent, service=service, operation=model.name, direction="sent")
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    call = context.pop("metrics_call", None)
+    if call is None:
+        return
+    service, operation, started = call
+    AWS_LATENCY.observe(
+        time.perf_counter() - started, service=service, operation=operation
+    )
+
+    if http_response.status_code >= 300:
+        code = parsed.get("Error", {}).get("Code") or str(http_response.status_code)
+        AWS_ERRORS.inc(service=service, operation=operation, code=code)
+
+    # Header rather than body, so streamed downloads are not read here
+    received = http_response.headers.get("Content-Length")
+    if received:
+        AWS_BYTES.inc(
+            int(received), service=service, operation=operation, direction="received"
+        )
+
+    consumed = parsed.get("ConsumedCapacity")
+    if consumed:
+        kind = "read" if operation in READ_OPERATIONS else "write"
+        for entry in consumed if isinstance(consumed, list) else [consumed]:
+            DYNAMODB_CAPACITY.inc(
+                entry.get("CapacityUnits", 0),
+                table=entry.get("TableName", ""),
+                kind=kind,
+            )
+
+
+def _after_call_error(exception, context, **kwargs):
+    # Raised before any response arrived (connection errors, timeouts)
+    call = context.pop("metrics_call", None)
+    if call is None:
+        return
+    service, operation, started = call
+    AWS_LATENCY.observe(
+        time.perf_counter() - started, service=service, operation=operation
+    )
+    AWS_ERRORS.inc(service=service, operation=operation, code=type(exception).__name__)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    return REGISTRY.render()
@@ -1,178 +1,222 @@
-from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import Optional, Dict, Any
-from decimal import Decimal  # Add this import
+from functools import lru_cache
+from typing import Any, Callable, Dict
+from decimal import Decimal
 import json
+from app.utils import DecimalEncoder, format_file_size
 
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super(DecimalEncoder, self).default(obj)
+def _plain_number(value):
+    """DynamoDB numbers come back as Decimal: ints stay ints, the rest floats"""
+    if value == value.to_integral_value():
+        return int(value)
+    return float(value)
+
+
+def _plain_map(value):
+    plain = {}
+    for key, item in value.items():
+        converter = _CONVERTERS.get(type(item))
+        plain[key] = converter(item) if converter else item
+    return plain
+
+
+def _plain_list(value):
+    plain = []
+    for item in value:
+        converter = _CONVERTERS.get(type(item))
+        plain.append(converter(item) if converter else item)
+    return plain
+
+
+# Conversion for each DynamoDB value type that is not already plain Python
+_CONVERTERS = {
+    Decimal: _plain_number,
+    dict: _plain_map,
+    list: _plain_list,
+    set: _plain_list,
+}
 
 
-@dataclass
 class BaseFile:
-    """Base model for all file types"""
-
-    title: Optional[str] = None
-    description: Optional[str] = None
-    s3_key: str = ""
-    file_url: str = ""
-    original_filename: str = ""
-    file_type: str = ""
-    file_size: int = 0
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
-
-    def __post_init__(self):
+    """Base model for all file types
+
+    Records are slotted (no per-instance __dict__) and described by FIELDS,
+    a table of (attribute, default) pairs. A callable default (e.g. dict) is
+    called for each record so containers are never shared. Fields listed in
+    EMPTY_AS_MISSING read an empty stored value (e.g. {}) like a missing one.
+    """
+
+    FIELDS = (
+        ("title", None),
+        ("description", None),
+        ("s3_key", ""),
+        ("file_url", ""),
+        ("original_filename", ""),
+        ("file_type", ""),
+        ("file_size", 0),
+        ("created_at", None),
+        ("updated_at", None),
+    )
+    __slots__ = tuple(name for name, _ in FIELDS)
+    EMPTY_AS_MISSING = ()
+
+    def __init__(self, **fields):
+        for name, default in self.FIELDS:
+            value = fields.pop(name, None)
+            if value is None:
+                value = default() if callable(default) else default
+            setattr(self, name, value)
+        if fields:
+            raise TypeError(
+                f"Unknown fields for {type(self).__name__}: {sorted(fields)}"
+            )
+        self._fill_empty()
+
+        now = datetime.now().isoformat()
         if not self.created_at:
-            self.created_at = datetime.now().isoformat()
+            self.created_at = now
         if not self.updated_at:
-            self.updated_at = datetime.now().isoformat()
+            self.updated_at = now
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "BaseFile":
+        """Build a record from a DynamoDB item in one pass over FIELDS
+
+        Decimals (including those nested in maps and lists) become ints or
+        floats; missing attributes get the field default.
+        """
+        record = cls.__new__(cls)
+        get = item.get
+        converters = _CONVERTERS
+        for name, default in cls.FIELDS:
+            value = get(name)
+            if value is None:
+                value = default() if callable(default) else default
+            elif type(value) in converters:
+                value = converters[type(value)](value)
+            setattr(record, name, value)
+        record._fill_empty()
+        return record
+
+    def _fill_empty(self):
+        for name in self.EMPTY_AS_MISSING:
+            if not getattr(self, name):
+                default = dict(self.FIELDS)[name]
+                setattr(self, name, default() if callable(default) else default)
+
+    @property
+    def formatted_size(self) -> str:
+        """Human readable file size, e.g. "1.5 MB" """
+        return format_file_size(self.file_size)
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert model to dictionary"""
-        data = asdict(self)
-        data["created_at"] = self.created_at
-        data["updated_at"] = self.updated_at
-        return data
+        return {name: getattr(self, name) for name, _ in self.FIELDS}
 
     def to_json(self) -> str:
         """Convert model to JSON string"""
         return json.dumps(self.to_dict(), cls=DecimalEncoder)
 
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={value!r}" for name, value in self.to_dict().items()
+        )
+        return f"{type(self).__name__}({fields})"
+
 
-@dataclass
 class Note(BaseFile):
     """Model for notes/documents"""
 
-    note_id: str = ""
-    tags: Optional[list] = None
+    FIELDS = (("note_id", ""),) + BaseFile.FIELDS + (("tags", list),)
+    __slots__ = ("note_id", "tags")
+
 
-    def __post_init__(self):
-        super().__post_init__()
-        if self.tags is None:
-            self.tags = []
+def _no_dimensions():
+    return {"width": 0, "height": 0}
 
 
-@dataclass
 class Image(BaseFile):
     """Model for images"""
 
-    image_id: str = ""
-    dimensions: Optional[Dict[str, int]] = None
-    exif_data: Optional[Dict[str, Any]] = None
-
-    def __post_init__(self):
-        super().__post_init__()
-        if self.dimensions is None:
-            self.dimensions = {"width": 0, "height": 0}
+    FIELDS = (
+        (("image_id", ""),)
+        + BaseFile.FIELDS
+        + (("dimensions", _no_dimensions), ("exif_data", dict), ("thumbnails", None))
+    )
+    __slots__ = ("image_id", "dimensions", "exif_data", "thumbnails")
+    EMPTY_AS_MISSING = ("dimensions",)
 
 
-@dataclass
 class Video(BaseFile):
     """Model for videos"""
 
-    video_id: str = ""
-    duration: float = 0.0
-    resolution: Optional[str] = None
-    thumbnail_key: Optional[str] = None
+    FIELDS = (
+        (("video_id", ""),)
+        + BaseFile.FIELDS
+        + (("duration", 0.0), ("resolution", None), ("thumbnail_key", None))
+    )
+    __slots__ = ("video_id", "duration", "resolution", "thumbnail_key")
+
+
+# Record type of each table/tab name
+RECORD_TYPES = {"notes": Note, "images": Image, "videos": Video}
+
+
+def decode_item(table_name: str, item: Dict[str, Any]) -> BaseFile:
+    """Build the record type of a table from one of its DynamoDB items"""
+    return RECORD_TYPES[table_name].from_item(item)
 
-    def __post_init__(self):
-        super().__post_init__()
+
+@lru_cache(maxsize=None)
+def item_serializer(record_type: type) -> Callable[[Dict[str, Any]], str]:
+    """Compile a function that turns a DynamoDB item straight into JSON
+
+    The output matches record_type.from_item(item).to_json() without
+    building the record: field names and defaults are resolved once, and
+    Decimals are encoded in place by the C encoder's default hook.
+    """
+    fields = tuple(
+        (name, default() if callable(default) else default)
+        for name, default in record_type.FIELDS
+    )
+    empty_as_missing = tuple(
+        (name, default)
+        for name, default in fields
+        if name in record_type.EMPTY_AS_MISSING
+    )
+    encode = DecimalEncoder(separators=(",", ":")).encode
+
+    def serialize(item):
+        get = item.get
+        record = {
+            name: default if (value := get(name)) is None else value
+            for name, default in fields
+        }
+        for name, default in empty_as_missing:
+            if not record[name]:
+                record[name] = default
+        return encode(record)
+
+    return serialize
 
 
 # Factory functions for creating models from DynamoDB items
 def create_note_from_dict(data: Dict[str, Any]) -> Note:
     """Create Note object from DynamoDB item"""
-    # Convert Decimal values to float
-    converted_data = {}
-    for key, value in data.items():
-        if isinstance(value, Decimal):
-            converted_data[key] = float(value)
-        elif isinstance(value, dict):
-            # Recursively convert nested dicts
-            converted_data[key] = {
-                k: float(v) if isinstance(v, Decimal) else v for k, v in value.items()
-            }
-        else:
-            converted_data[key] = value
-
-    return Note(
-        note_id=converted_data.get("note_id", ""),
-        title=converted_data.get("title"),
-        description=converted_data.get("description"),
-        s3_key=converted_data.get("s3_key", ""),
-        file_url=converted_data.get("file_url", ""),
-        original_filename=converted_data.get("original_filename", ""),
-        file_type=converted_data.get("file_type", ""),
-        file_size=converted_data.get("file_size", 0),
-        created_at=converted_data.get("created_at"),
-        updated_at=converted_data.get("updated_at"),
-        tags=converted_data.get("tags", []),
-    )
+    return Note.from_item(data)
 
 
 def create_image_from_dict(data: Dict[str, Any]) -> Image:
     """Create Image object from DynamoDB item"""
-    # Convert Decimal values to float
-    converted_data = {}
-    for key, value in data.items():
-        if isinstance(value, Decimal):
-            converted_data[key] = float(value)
-        elif isinstance(value, dict):
-            converted_data[key] = {
-                k: float(v) if isinstance(v, Decimal) else v for k, v in value.items()
-            }
-        else:
-            converted_data[key] = value
-
-    return Image(
-        image_id=converted_data.get("image_id", ""),
-        title=converted_data.get("title"),
-        description=converted_data.get("description"),
-        s3_key=converted_data.get("s3_key", ""),
-        file_url=converted_data.get("file_url", ""),
-        original_filename=converted_data.get("original_filename", ""),
-        file_type=converted_data.get("file_type", ""),
-        file_size=converted_data.get("file_size", 0),
-        created_at=converted_data.get("created_at"),
-        updated_at=converted_data.get("updated_at"),
-        dimensions=converted_data.get("dimensions", {}),
-        exif_data=converted_data.get("exif_data", {}),
-    )
+    return Image.from_item(data)
 
 
 def create_video_from_dict(data: Dict[str, Any]) -> Video:
     """Create Video object from DynamoDB item"""
-    # Convert Decimal values to float
-    converted_data = {}
-    for key, value in data.items():
-        if isinstance(value, Decimal):
-            converted_data[key] = float(value)
-        elif isinstance(value, dict):
-            converted_data[key] = {
-                k: float(v) if isinstance(v, Decimal) else v for k, v in value.items()
-            }
-        else:
-            converted_data[key] = value
-
-    return Video(
-        video_id=converted_data.get("video_id", ""),
-        title=converted_data.get("title"),
-        description=converted_data.get("description"),
-        s3_key=converted_data.get("s3_key", ""),
-        file_url=converted_data.get("file_url", ""),
-        original_filename=converted_data.get("original_filename", ""),
-        file_type=converted_data.get("file_type", ""),
-        file_size=converted_data.get("file_size", 0),
-        created_at=converted_data.get("created_at"),
-        updated_at=converted_data.get("updated_at"),
-        duration=converted_data.get("duration", 0.0),
-        resolution=converted_data.get("resolution"),
-        thumbnail_key=converted_data.get("thumbnail_key"),
-    )
+    return Video.from_item(data)
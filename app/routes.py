@@ -6,11 +6,29 @@ from flask import (
     redirect,
     url_for,
     flash,
-    send_file,
+    Response,
+    stream_with_context,
+    abort,
+    make_response,
+    session,
 )
 from app.s3_service import S3Service
-from app.dynamodb_service import DynamoDBService
+from app.dynamodb_service import (
+    DynamoDBService,
+    FILE_TYPES,
+    ID_KEYS,
+    stats_from_record,
+)
+from app.cache import CachedDynamoDBService, TTLCache
+from app.upload_pipeline import UploadStream
+from app.jobs import JobQueue
+from app import metrics
+from app.thumbnails import THUMBNAIL_FORMATS, generate_thumbnails, thumbnail_keys
+from app.media_probe import probe_image_from_s3
+from app.video_probe import RangeReader, probe_video
 from app.models import (
+    RECORD_TYPES,
+    item_serializer,
     create_note_from_dict,
     create_image_from_dict,
     create_video_from_dict,
@@ -19,74 +37,230 @@ from app.utils import (
     allowed_file,
     get_file_type,
     get_mime_type,
-    get_image_dimensions,
+    get_image_info,
+    split_image_info,
+    split_video_info,
     format_file_size,
+    sort_files,
     validate_file_mime_type,
 )
-import os
+import re
+import gzip
+import json
+import zlib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from werkzeug.utils import secure_filename
 from config import Config
-import tempfile
-from datetime import datetime
+from datetime import datetime, timezone
 
 bp = Blueprint("main", __name__)
 s3_service = S3Service()
-db_service = DynamoDBService()
+db_service = CachedDynamoDBService() if Config.CACHE_ENABLED else DynamoDBService()
+fragment_cache = TTLCache(
+    max_size=Config.FRAGMENT_CACHE_MAX_ENTRIES, ttl=Config.FRAGMENT_CACHE_TTL_SECONDS
+)
+job_queue = JobQueue(
+    Config.JOBS_DB_PATH,
+    max_workers=Config.JOB_WORKERS,
+    max_attempts=Config.JOB_MAX_ATTEMPTS,
+    retry_backoff=Config.JOB_RETRY_BACKOFF_SECONDS,
+    stale_after=Config.JOB_STALE_SECONDS,
+    sweep_interval=Config.JOB_SWEEP_SECONDS,
+)
 
+# Browse sorts applied to one scan page at a time (dates page in order)
+PAGE_SORTS = ("name", "size", "type")
 
-@bp.route("/")
-def index():
-    """Home page with upload and browse options"""
-    # Get counts for display
-    notes = db_service.get_all_notes()
-    images = db_service.get_all_images()
-    videos = db_service.get_all_videos()
+# Media type of the streamed form of /api/items/<file_type>
+NDJSON_MIMETYPE = "application/x-ndjson"
 
-    # Convert to models
-    note_models = [create_note_from_dict(note) for note in notes]
-    image_models = [create_image_from_dict(image) for image in images]
-    video_models = [create_video_from_dict(video) for video in videos]
-
-    # Get all files combined and sort by date
-    all_files = note_models + image_models + video_models
-    # Sort by created_at (newest first)
-    all_files.sort(
-        key=lambda x: x.created_at if hasattr(x, "created_at") else "", reverse=True
-    )
+# Display name for each table/tab name
+FILE_LABELS = {"notes": "Note", "images": "Image", "videos": "Video"}
+
+# Model factory for each table/tab name
+MODEL_FACTORIES = {
+    "notes": create_note_from_dict,
+    "images": create_image_from_dict,
+    "videos": create_video_from_dict,
+}
+
+
+@bp.app_template_global()
+def media_url(item, file_type, download=False):
+    """URL a template should use to show or download an item's file"""
+    if Config.MEDIA_DELIVERY == "presigned":
+        return s3_service.get_presigned_url(
+            item.s3_key, download_name=item.original_filename if download else None
+        )
+    if Config.MEDIA_DELIVERY == "proxy":
+        item_id = getattr(item, f"{file_type}_id")
+        if download:
+            return url_for("main.download_item", file_type=file_type, item_id=item_id)
+        return url_for(
+            "main.download_item", file_type=file_type, item_id=item_id, inline=1
+        )
+    return item.file_url
+
+
+def _object_url(s3_key):
+    """URL for a derived object (e.g. a thumbnail) under the delivery mode"""
+    if Config.MEDIA_DELIVERY == "presigned":
+        return s3_service.get_presigned_url(s3_key)
+    return s3_service.get_file_url(s3_key)
+
+
+@bp.app_template_global()
+def thumbnail_srcset(item, fmt="jpeg"):
+    """srcset value listing an image's thumbnails in one format"""
+    candidates, widths = [], set()
+    for size, entry in sorted(
+        (getattr(item, "thumbnails", None) or {}).items(), key=lambda e: int(e[0])
+    ):
+        # Older records may list several sizes rendered at the same width
+        if fmt not in entry or int(entry["width"]) in widths:
+            continue
+        widths.add(int(entry["width"]))
+        if Config.MEDIA_DELIVERY == "proxy":
+            url = url_for("main.thumbnail", image_id=item.image_id, size=size, fmt=fmt)
+        else:
+            url = _object_url(entry[fmt])
+        candidates.append(f"{url} {int(entry['width'])}w")
+    return ", ".join(candidates)
+
+
+def _validators(tables, *parts, page=True, stats=None):
+    """(ETag, Last-Modified) of a response built from some tables, or (None, None)
+
+    Both derive from the tables' version stamps in the totals record, so
+    checking them costs one (cached) read, or none when the caller passes
+    the stats it already read. parts are the other inputs of the response,
+    e.g. query arguments. Pages are not revalidated while flash messages
+    are pending, or when they embed presigned URLs, which expire.
+    """
+    if page and (session.get("_flashes") or Config.MEDIA_DELIVERY == "presigned"):
+        return None, None
+    if stats is None:
+        stats = _read_stats()
+    if stats is None:
+        return None, None
+
+    versions = [stats[f"{table}_version"] for table in tables]
+    modified = max(stats[f"{table}_modified"] for table in tables)
+    key = repr((Config.ETAG_SALT, Config.MEDIA_DELIVERY, versions, parts))
+    etag = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return etag, datetime.fromtimestamp(modified, timezone.utc)
+
+
+def _not_modified(etag, last_modified):
+    """A 304 response if the client's copy is still current, else None"""
+    if etag is None:
+        return None
+    if request.if_none_match:
+        current = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        current = since is not None and last_modified <= since
+    if not current:
+        return None
+    return _with_validators(Response(status=304), etag, last_modified)
+
+
+def _with_validators(response, etag, last_modified):
+    """Attach the ETag and Last-Modified headers (if any) to a response"""
+    response = make_response(response)
+    if etag is not None:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Browsers may keep the page but must revalidate it on every use
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _read_stats():
+    """Counts and version stamps from the totals record, or None if unreadable"""
+    try:
+        return db_service.get_stats()
+    except Exception as e:
+        print(f"Error reading stats: {e}")
+        return None
+
+
+def _cached_fragment(key, render):
+    """A rendered fragment from the fragment cache, calling render() on a miss
+
+    render() returns (fragment, cacheable); results of partial reads should
+    not be cached. A key of None, or presigned media delivery (the embedded
+    URLs expire), bypasses the cache.
+    """
+    if (
+        key is None
+        or not Config.FRAGMENT_CACHE_ENABLED
+        or Config.MEDIA_DELIVERY == "presigned"
+    ):
+        return render()[0]
+    fragment = fragment_cache.get(key)
+    if fragment is None:
+        fragment, cacheable = render()
+        if cacheable:
+            fragment_cache.set(key, fragment)
+    return fragment
+
+
+def _recent_rows(stats, limit):
+    """Rendered rows of the recent files table, cached until any table changes"""
+
+    def render():
+        recent_activity, complete = db_service.get_recent_feed(limit, projection="card")
+        recent_files = [
+            MODEL_FACTORIES[file_type](item) for file_type, item in recent_activity
+        ]
+        html = render_template(
+            "components/recent_files.html", recent_files=recent_files
+        )
+        return html, complete
+
+    key = None
+    if stats is not None:
+        key = ("recent", limit) + tuple(stats[f"{t}_version"] for t in FILE_TYPES)
+    return _cached_fragment(key, render)
 
-    # Take only recent 5 files
-    recent_files = all_files[:5]
 
-    # Format file sizes
-    for file in recent_files:
-        if hasattr(file, "file_size"):
-            file.formatted_size = format_file_size(file.file_size)
+@bp.route("/")
+def index():
+    """Home page with upload and browse options"""
+    # Counts and the 5 most recent files across all types
+    stats = _read_stats()
+    recent_rows = _recent_rows(stats, 5)
+    stats = stats or stats_from_record()
 
     return render_template(
         "index.html",
-        notes_count=len(note_models),
-        images_count=len(image_models),
-        videos_count=len(video_models),
-        recent_files=recent_files,  # Add this
+        notes_count=stats["notes_count"],
+        images_count=stats["images_count"],
+        videos_count=stats["videos_count"],
+        recent_rows=recent_rows,
     )
 
 
 @bp.route("/stats")
 def statistics():
     """Show statistics about stored files"""
-    notes = db_service.get_all_notes()
-    images = db_service.get_all_images()
-    videos = db_service.get_all_videos()
+    stats = _read_stats()
+    recent_rows = _recent_rows(stats, 10)
+    stats = stats or stats_from_record()
 
     # Calculate statistics
-    notes_count = len(notes)
-    images_count = len(images)
-    videos_count = len(videos)
+    notes_count = stats["notes_count"]
+    images_count = stats["images_count"]
+    videos_count = stats["videos_count"]
     total_count = notes_count + images_count + videos_count
 
     # Calculate total size
-    notes_size = sum(note.get("file_size", 0) for note in notes)
-    images_size = sum(image.get("file_size", 0) for image in images)
-    videos_size = sum(video.get("file_size", 0) for video in videos)
+    notes_size = stats["notes_size"]
+    images_size = stats["images_size"]
+    videos_size = stats["videos_size"]
     total_size = notes_size + images_size + videos_size
 
     # Format sizes
@@ -95,29 +269,6 @@ def statistics():
     videos_size_fmt = format_file_size(videos_size)
     total_size_fmt = format_file_size(total_size)
 
-    # Get recent files for activity
-    all_files = []
-    for note in notes:
-        note_dict = create_note_from_dict(note)
-        note_dict.formatted_size = format_file_size(note.get("file_size", 0))
-        all_files.append(note_dict)
-
-    for image in images:
-        image_dict = create_image_from_dict(image)
-        image_dict.formatted_size = format_file_size(image.get("file_size", 0))
-        all_files.append(image_dict)
-
-    for video in videos:
-        video_dict = create_video_from_dict(video)
-        video_dict.formatted_size = format_file_size(video.get("file_size", 0))
-        all_files.append(video_dict)
-
-    # Sort by created_at (newest first)
-    all_files.sort(
-        key=lambda x: x.created_at if hasattr(x, "created_at") else "", reverse=True
-    )
-    recent_files = all_files[:10]
-
     return render_template(
         "stats.html",
         notes_count=notes_count,
@@ -128,13 +279,192 @@ def statistics():
         images_size=images_size_fmt,
         videos_size=videos_size_fmt,
         total_size=total_size_fmt,
-        recent_files=recent_files,  # Add this
+        recent_rows=recent_rows,
         usage_percentage=min(
             100, (total_size / (1024 * 1024 * 1024)) * 100
         ),  # Calculate as % of 1GB
     )
 
 
+def _store_upload(file, file_type, title="", description=""):
+    """Validate one uploaded file, stream it to S3 and record its metadata
+
+    The type comes from the first SNIFF_BYTES and the size is counted while
+    S3 consumes the stream. Image and video headers are probed from the
+    spooled upload before that, since upload_fileobj closes seekable files.
+    """
+    stream = UploadStream(file.stream, Config.SNIFF_BYTES)
+
+    # Validate actual file type
+    if not validate_file_mime_type(stream.header, file_type, file.filename):
+        return {
+            "success": False,
+            "invalid": True,
+            "error": f"File content doesn't match expected type: {file_type}",
+        }
+    mime_type = get_mime_type(stream.header, file.filename)
+
+    # Probes read the spooled file past SNIFF_BYTES where headers need it;
+    # the position is restored for the rest of the upload stream
+    media = {}
+    position = file.stream.tell()
+    if file_type == "images":
+        media["dimensions"], media["exif_data"] = split_image_info(
+            get_image_info(file.stream)
+        )
+    elif file_type == "videos":
+        # Only the container headers are read, never the media data
+        media["duration"], media["resolution"] = split_video_info(
+            probe_video(RangeReader.from_file(file.stream))
+        )
+    file.stream.seek(position)
+
+    if Config.CONTENT_ADDRESSED_STORAGE:
+        upload_result = _upload_content_addressed(file, stream, mime_type, file_type)
+    else:
+        upload_result = s3_service.upload_file(
+            stream, mime_type, folder=file_type, original_filename=file.filename
+        )
+    if not upload_result["success"]:
+        return {"success": False, "error": f"Upload failed: {upload_result['error']}"}
+
+    # Prepare metadata for DynamoDB
+    metadata = {
+        "title": title,
+        "description": description,
+        "s3_key": upload_result["s3_key"],
+        "file_url": upload_result["file_url"],
+        "original_filename": upload_result["original_filename"],
+        "file_type": mime_type,
+        "file_size": stream.bytes_read,
+        "content_hash": stream.sha256,
+        "content_addressed": Config.CONTENT_ADDRESSED_STORAGE or None,
+        **media,
+    }
+
+    try:
+        item_id = db_service.create_item(file_type, metadata)
+    except Exception:
+        if Config.CONTENT_ADDRESSED_STORAGE:
+            _release_file(metadata)
+        raise
+    return {
+        "success": True,
+        "item_id": item_id,
+        "original_filename": upload_result["original_filename"],
+        "job_ids": _submit_derived_jobs(file_type, item_id, metadata),
+    }
+
+
+def _upload_content_addressed(file, stream, mime_type, file_type):
+    """Store a file under its SHA-256, skipping the PUT if it is already stored"""
+    # Hash the (already spooled) upload before deciding whether to send it
+    stream.drain()
+    s3_key = s3_service.content_key(file_type, file.filename, stream.sha256)
+
+    # The first reference uploads; later ones only check the object is there
+    if db_service.acquire_blob(s3_key) > 1 and s3_service.head_file(s3_key):
+        return {
+            "success": True,
+            "s3_key": s3_key,
+            "file_url": s3_service.get_file_url(s3_key),
+            "original_filename": secure_filename(file.filename),
+            "deduplicated": True,
+        }
+
+    file.stream.seek(0)
+    upload_result = s3_service.upload_file(
+        file.stream,
+        mime_type,
+        folder=file_type,
+        original_filename=file.filename,
+        s3_key=s3_key,
+    )
+    if not upload_result["success"]:
+        db_service.release_blob(s3_key)
+    return upload_result
+
+
+def _release_file(item):
+    """Delete an item's S3 object, unless other records still share it"""
+    return _release_files([item])
+
+
+def _release_files(items):
+    """Delete the S3 objects of removed records with batched delete calls
+
+    Objects still shared with other records are kept. Returns the keys S3
+    failed to delete.
+    """
+    s3_keys = []
+    for item in items:
+        if item.get("content_addressed") and not db_service.release_blob(
+            item["s3_key"]
+        ):
+            continue
+        s3_keys.append(item["s3_key"])
+        s3_keys.extend(thumbnail_keys(item.get("thumbnails")))
+    return s3_service.delete_files(s3_keys) if s3_keys else []
+
+
+def _submit_derived_jobs(file_type, item_id, metadata):
+    """Queue the background work that fills in an item's derived fields"""
+    payload = {"item_id": item_id, "s3_key": metadata["s3_key"]}
+    job_ids = []
+    if file_type == "images" and Config.THUMBNAILS_ENABLED:
+        job_ids.append(job_queue.submit("thumbnails", payload))
+    elif file_type == "videos" and "duration" not in metadata:
+        # Direct uploads are probed from S3; form uploads were probed inline
+        job_ids.append(job_queue.submit("video_metadata", payload))
+    return job_ids
+
+
+def _update_derived_fields(table_name, item_id, fields):
+    """Write job output to a record; False if the record was deleted meanwhile"""
+    try:
+        db_service.update_item_fields(table_name, item_id, fields)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
+
+
+@job_queue.register("thumbnails")
+def _thumbnails_job(payload):
+    s3_key = payload["s3_key"]
+    if s3_service.head_file(s3_key) is None:
+        return {"skipped": "file deleted"}
+
+    with s3_service.download_to_spool(s3_key) as spool:
+        thumbnails = generate_thumbnails(s3_service, spool, s3_key)
+    if not _update_derived_fields(
+        "images", payload["item_id"], {"thumbnails": thumbnails}
+    ):
+        # Thumbnails of a content-addressed object are shared by every record
+        # of it, so they go with the last reference (as in _release_files)
+        if db_service.blob_refs(s3_key) <= 0:
+            s3_service.delete_files(thumbnail_keys(thumbnails))
+        return {"skipped": "record deleted"}
+    return {"sizes": sorted(thumbnails, key=int)}
+
+
+@job_queue.register("video_metadata")
+def _video_metadata_job(payload):
+    try:
+        reader = RangeReader.from_s3(s3_service, payload["s3_key"])
+    except FileNotFoundError:
+        return {"skipped": "file deleted"}
+
+    duration, resolution = split_video_info(probe_video(reader))
+    fields = {"duration": duration}
+    if resolution:
+        fields["resolution"] = resolution
+    if not _update_derived_fields("videos", payload["item_id"], fields):
+        return {"skipped": "record deleted"}
+    return {"duration": float(duration), "resolution": resolution}
+
+
 @bp.route("/upload", methods=["GET", "POST"])
 def upload():
     """Upload page with tabs for different file types"""
@@ -156,102 +486,187 @@ def upload():
             flash("File type not allowed", "error")
             return redirect(request.url)
 
-        # Create a unique temporary file name
-        import tempfile
-        import shutil
-
-        tmp_path = None
         try:
-            # Save to a temporary file
-            with tempfile.NamedTemporaryFile(
-                delete=False, suffix=os.path.splitext(file.filename)[1]
-            ) as tmp_file:
-                tmp_path = tmp_file.name
-                file.save(tmp_path)
-
-            # Validate actual file type
-            if not validate_file_mime_type(tmp_path, file_type):
-                flash(f"File content doesn't match expected type: {file_type}", "error")
-                if tmp_path and os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-                return redirect(request.url)
-
-            # Get file metadata
-            file_size = os.path.getsize(tmp_path)
-            mime_type = get_mime_type(tmp_path)
-
-            # Upload to S3 - read from the saved file
-            with open(tmp_path, "rb") as file_obj:
-                upload_result = s3_service.upload_file(
-                    file_obj,
-                    mime_type,
-                    folder=file_type,
-                    original_filename=file.filename,
+            result = _store_upload(file, file_type, title, description)
+            if result["success"]:
+                flash(
+                    f"{FILE_LABELS[file_type]} '{result['original_filename']}' uploaded successfully!",
+                    "success",
                 )
-
-            if upload_result["success"]:
-                # Prepare metadata for DynamoDB
-                metadata = {
-                    "title": title,
-                    "description": description,
-                    "s3_key": upload_result["s3_key"],
-                    "file_url": upload_result["file_url"],
-                    "original_filename": upload_result["original_filename"],
-                    "file_type": mime_type,
-                    "file_size": file_size,
-                }
-
-                # Store metadata in appropriate table
-                if file_type == "notes":
-                    note_id = db_service.create_note(metadata)
-                    flash(
-                        f"Note '{upload_result['original_filename']}' uploaded successfully!",
-                        "success",
-                    )
-                elif file_type == "images":
-                    # Get image dimensions
-                    metadata["dimensions"] = get_image_dimensions(tmp_path)
-                    image_id = db_service.create_image(metadata)
-                    flash(
-                        f"Image '{upload_result['original_filename']}' uploaded successfully!",
-                        "success",
-                    )
-                elif file_type == "videos":
-                    metadata["duration"] = 0  # Placeholder for video duration
-                    video_id = db_service.create_video(metadata)
-                    flash(
-                        f"Video '{upload_result['original_filename']}' uploaded successfully!",
-                        "success",
-                    )
-
+            elif result.get("invalid"):
+                flash(result["error"], "error")
+                return redirect(request.url)
             else:
-                flash(f"Upload failed: {upload_result['error']}", "error")
+                flash(result["error"], "error")
 
         except Exception as e:
             flash(f"Error processing file: {str(e)}", "error")
             import traceback
 
             print(f"Upload error: {traceback.format_exc()}")
-        finally:
-            # Cleanup temp file with retry logic for Windows
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except PermissionError:
-                    # Windows might still have the file locked, try again after a delay
-                    import time
-
-                    time.sleep(0.1)
-                    try:
-                        os.unlink(tmp_path)
-                    except:
-                        pass  # Give up if still locked
 
         return redirect(url_for("main.browse"))
 
     # GET request - show upload form
     file_type = request.args.get("type", "notes")
-    return render_template("upload.html", current_type=file_type)
+    return render_template(
+        "upload.html", current_type=file_type, direct_uploads=Config.DIRECT_UPLOADS
+    )
+
+
+@bp.route("/api/uploads/bulk", methods=["POST"])
+def bulk_upload():
+    """Upload several files of one type, storing them concurrently"""
+    file_type = request.form.get("file_type")
+    title = request.form.get("title", "")
+    description = request.form.get("description", "")
+    files = [file for file in request.files.getlist("files") if file.filename]
+
+    if file_type not in MODEL_FACTORIES:
+        return jsonify({"error": "Invalid file type"}), 400
+    if not files:
+        return jsonify({"error": "No file selected"}), 400
+    if len(files) > Config.BULK_MAX_FILES:
+        return (
+            jsonify({"error": f"At most {Config.BULK_MAX_FILES} files per request"}),
+            400,
+        )
+
+    def store(file):
+        if not allowed_file(file.filename, file_type):
+            return {"success": False, "error": "File type not allowed"}
+        try:
+            return _store_upload(file, file_type, title, description)
+        except Exception as e:
+            import traceback
+
+            print(f"Upload error: {traceback.format_exc()}")
+            return {"success": False, "error": f"Error processing file: {str(e)}"}
+
+    with ThreadPoolExecutor(max_workers=Config.BULK_UPLOAD_WORKERS) as executor:
+        results = list(executor.map(store, files))
+
+    uploaded, failed = [], []
+    for file, result in zip(files, results):
+        if result["success"]:
+            uploaded.append(
+                {
+                    "filename": file.filename,
+                    "id": result["item_id"],
+                    "job_ids": result["job_ids"],
+                }
+            )
+        else:
+            failed.append({"filename": file.filename, "error": result["error"]})
+
+    status = 201 if not failed else 207 if uploaded else 400
+    return jsonify({"uploaded": uploaded, "failed": failed}), status
+
+
+# Keys handed out by /api/uploads/presign: "<folder>/<uuid4><.ext>"
+UPLOAD_KEY_RE = re.compile(
+    r"^(notes|images|videos)/[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[0-9a-f]{4}-[0-9a-f]{12}(\.[a-z0-9]+)?$"
+)
+
+
+@bp.route("/api/uploads/presign", methods=["POST"])
+def presign_upload():
+    """Issue a presigned POST so the browser can upload straight to S3"""
+    data = request.get_json(silent=True) or {}
+    file_type = data.get("file_type")
+    filename = data.get("filename", "")
+    content_type = data.get("content_type") or "application/octet-stream"
+
+    if file_type not in MODEL_FACTORIES or not allowed_file(filename, file_type):
+        return jsonify({"error": "File type not allowed"}), 400
+
+    file_size = data.get("file_size")
+    if isinstance(file_size, int) and file_size > Config.MAX_CONTENT_LENGTH:
+        return jsonify({"error": "File is too large"}), 413
+
+    s3_key = s3_service.new_file_key(file_type, filename)
+    post = s3_service.create_presigned_upload(
+        s3_key, content_type, Config.MAX_CONTENT_LENGTH
+    )
+    return jsonify(
+        {
+            "url": post["url"],
+            "fields": post["fields"],
+            "s3_key": s3_key,
+            "finalize_url": url_for("main.finalize_upload"),
+        }
+    )
+
+
+@bp.route("/api/uploads/finalize", methods=["POST"])
+def finalize_upload():
+    """Check a directly uploaded object and write its metadata record"""
+    data = request.get_json(silent=True) or {}
+    file_type = data.get("file_type")
+    s3_key = data.get("s3_key", "")
+    filename = data.get("filename", "")
+
+    if (
+        file_type not in MODEL_FACTORIES
+        or not UPLOAD_KEY_RE.match(s3_key)
+        or not s3_key.startswith(f"{file_type}/")
+        or not allowed_file(filename, file_type)
+    ):
+        return jsonify({"error": "Invalid upload"}), 400
+
+    head = s3_service.head_file(s3_key)
+    if head is None:
+        return jsonify({"error": "Uploaded file not found"}), 404
+
+    # Sniff the real type from the first bytes instead of trusting the client
+    header = s3_service.read_range(s3_key, 0, Config.SNIFF_BYTES)
+    if not validate_file_mime_type(header, file_type, filename):
+        s3_service.delete_file(s3_key)
+        return (
+            jsonify(
+                {"error": f"File content doesn't match expected type: {file_type}"}
+            ),
+            400,
+        )
+
+    if not db_service.claim_upload(s3_key):
+        return jsonify({"error": "Upload already finalized"}), 409
+
+    metadata = {
+        "title": data.get("title", ""),
+        "description": data.get("description", ""),
+        "s3_key": s3_key,
+        "file_url": s3_service.get_file_url(s3_key),
+        "original_filename": secure_filename(filename),
+        "file_type": get_mime_type(header, filename),
+        "file_size": head["ContentLength"],
+    }
+    if file_type == "images":
+        info = get_image_info(header)
+        if info is None:
+            # The header did not fit in SNIFF_BYTES; widen the ranged reads
+            info = probe_image_from_s3(s3_service, s3_key, Config.SNIFF_BYTES)
+        metadata["dimensions"], metadata["exif_data"] = split_image_info(info)
+
+    try:
+        item_id = db_service.create_item(file_type, metadata)
+    except Exception:
+        # Let a retry of finalize record the upload instead of getting a 409
+        db_service.release_upload(s3_key)
+        raise
+    return (
+        jsonify(
+            {
+                "id": item_id,
+                "file_type": file_type,
+                "job_ids": _submit_derived_jobs(file_type, item_id, metadata),
+                "view_url": url_for(
+                    "main.view_item", file_type=file_type[:-1], item_id=item_id
+                ),
+            }
+        ),
+        201,
+    )
 
 
 @bp.route("/browse")
@@ -262,87 +677,128 @@ def browse():
     sort_by = request.args.get("sort", "newest")  # Get sort parameter
     sort_order = request.args.get("order", "desc")  # Get order parameter
 
-    # Get items based on tab and convert to models
-    if tab == "notes":
-        if search_term:
-            items_data = db_service.search_items("notes", search_term)
-        else:
-            items_data = db_service.get_all_notes()
-        items = [create_note_from_dict(item) for item in items_data]
-        file_type = "notes"
-    elif tab == "images":
-        if search_term:
-            items_data = db_service.search_items("images", search_term)
-        else:
-            items_data = db_service.get_all_images()
-        items = [create_image_from_dict(item) for item in items_data]
-        file_type = "images"
-    elif tab == "videos":
-        if search_term:
-            items_data = db_service.search_items("videos", search_term)
-        else:
-            items_data = db_service.get_all_videos()
-        items = [create_video_from_dict(item) for item in items_data]
-        file_type = "videos"
-    else:
-        items = []
-        file_type = "notes"
+    cursor = request.args.get("cursor") or None
+    stats = _read_stats()
 
-    # Apply sorting
-    items = sort_files(items, sort_by, sort_order)
+    # The page shows every tab's count, so it changes with any table
+    etag, last_modified = _validators(
+        FILE_TYPES, tab, search_term, sort_by, sort_order, cursor, stats=stats
+    )
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    # The rendered item list only changes with the tab's version stamp, so
+    # a cached one saves both the read and the render
+    key = None
+    if stats is not None and tab in MODEL_FACTORIES:
+        key = ("browse", tab, search_term, sort_by, sort_order, cursor)
+        key += (stats[f"{tab}_version"],)
+
+    def render():
+        html, item_count, cacheable = _render_browse_items(
+            tab, search_term, sort_by, sort_order, cursor
+        )
+        return (html, item_count), cacheable
 
-    # Format file sizes and prepare for template
-    for item in items:
-        if hasattr(item, "file_size"):
-            item.formatted_size = format_file_size(item.file_size)
+    items_html, item_count = _cached_fragment(key, render)
+    if session.get("_flashes"):
+        # A read failed while rendering; the page shows the error
+        etag = None
 
-    # Get counts for all tabs
-    all_notes = db_service.get_all_notes()
-    all_images = db_service.get_all_images()
-    all_videos = db_service.get_all_videos()
+    # Counts for all tabs (zero if the totals record could not be read)
+    stats = stats or stats_from_record()
 
     # Calculate total_count
-    total_count = len(all_notes) + len(all_images) + len(all_videos)
+    total_count = stats["notes_count"] + stats["images_count"] + stats["videos_count"]
 
-    return render_template(
+    page = render_template(
         "browse.html",
-        items=items,
+        items_html=items_html,
+        item_count=item_count,
         current_tab=tab,
         search_term=search_term,
-        file_type=file_type,
-        notes_count=len(all_notes),
-        images_count=len(all_images),
-        videos_count=len(all_videos),
+        file_type=tab if tab in MODEL_FACTORIES else "notes",
+        notes_count=stats["notes_count"],
+        images_count=stats["images_count"],
+        videos_count=stats["videos_count"],
         total_count=total_count,
         sort_by=sort_by,
         sort_order=sort_order,
     )
+    return _with_validators(page, etag, last_modified)
 
 
-def sort_files(files, sort_by="newest", order="desc"):
-    """Sort files based on criteria"""
-    if not files:
-        return files
+def _browse_order(search_term, sort_by, sort_order):
+    """Index order a browse page is read in, or None for a scan page
+
+    Date sorts page through the created_at index in order; the other sorts
+    can only order the scan page they are given.
+    """
+    if search_term or sort_by in PAGE_SORTS:
+        return None
+    return "newest" if sort_order == "desc" else "oldest"
 
-    # Determine sort key
-    if sort_by == "name":
-        sort_key = lambda x: (x.title or x.original_filename or "").lower()
-    elif sort_by == "size":
-        sort_key = lambda x: getattr(x, "file_size", 0)
-    elif sort_by == "type":
-        sort_key = lambda x: getattr(x, "file_type", "")
-    else:  # Default to date (newest/oldest)
-        sort_key = lambda x: getattr(x, "created_at", "")
 
-    # Sort the files
-    sorted_files = sorted(files, key=sort_key, reverse=(order == "desc"))
+def _read_browse_items(tab, search_term, order, cursor):
+    """One tab's items and next cursor (raises ValueError for a bad cursor)"""
+    if search_term:
+        return db_service.search_items(tab, search_term, projection="card"), None
+    return db_service.list_items(tab, cursor=cursor, projection="card", order=order)
 
-    return sorted_files
+
+def _render_browse_items(tab, search_term, sort_by, sort_order, cursor):
+    """Render one tab's item list
+
+    Returns (html, item count, cacheable). Read errors are flashed and
+    make the result uncacheable.
+    """
+    items_data, next_cursor, cacheable = [], None, True
+    order = _browse_order(search_term, sort_by, sort_order)
+    if tab in MODEL_FACTORIES:
+        try:
+            items_data, next_cursor = _read_browse_items(
+                tab, search_term, order, cursor
+            )
+        except ValueError:
+            flash("Invalid page link, showing the first page", "error")
+            cursor, cacheable = None, False
+            items_data, next_cursor = _read_browse_items(tab, search_term, order, None)
+        except Exception as e:
+            print(f"Error loading {tab}: {e}")
+            flash("Some files could not be loaded, please try again", "error")
+            cacheable = False
+
+    items = [MODEL_FACTORIES[tab](item) for item in items_data]
+    if order is None:
+        items = sort_files(items, sort_by, sort_order)
+    html = render_template(
+        "components/browse_items.html",
+        items=items,
+        current_tab=tab,
+        search_term=search_term,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        next_cursor=next_cursor,
+    )
+    return html, len(items), cacheable
 
 
 @bp.route("/view/<file_type>/<item_id>")
 def view_item(file_type, item_id):
     """View specific item details"""
+    table = f"{file_type}s"
+    etag, last_modified = (
+        _validators([table], file_type, item_id)
+        if table in MODEL_FACTORIES
+        else (None, None)
+    )
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    item = None
     if file_type == "note":
         item_data = db_service.get_note_by_id(item_id)
         if item_data:
@@ -355,41 +811,36 @@ def view_item(file_type, item_id):
         item_data = db_service.get_video_by_id(item_id)
         if item_data:
             item = create_video_from_dict(item_data)
-    else:
-        item = None
 
     if not item:
         flash("Item not found", "error")
         return redirect(url_for("main.browse"))
 
-    # Format file size
-    if hasattr(item, "file_size"):
-        item.formatted_size = format_file_size(item.file_size)
-
-    return render_template("view_content.html", item=item, file_type=file_type)
+    return _with_validators(
+        render_template("view_content.html", item=item, file_type=file_type),
+        etag,
+        last_modified,
+    )
 
 
 @bp.route("/delete/<file_type>/<item_id>", methods=["POST"])
 def delete_item(file_type, item_id):
     """Delete an item"""
-    # Get item first to get S3 key
+    # Delete the record first; the returned old record has the S3 key
     if file_type == "note":
-        item = db_service.get_note_by_id(item_id)
+        item = db_service.delete_note(item_id)
         if item:
-            s3_service.delete_file(item["s3_key"])
-            db_service.delete_note(item_id)
+            _release_file(item)
             flash("Note deleted successfully", "success")
     elif file_type == "image":
-        item = db_service.get_image_by_id(item_id)
+        item = db_service.delete_image(item_id)
         if item:
-            s3_service.delete_file(item["s3_key"])
-            db_service.delete_image(item_id)
+            _release_file(item)
             flash("Image deleted successfully", "success")
     elif file_type == "video":
-        item = db_service.get_video_by_id(item_id)
+        item = db_service.delete_video(item_id)
         if item:
-            s3_service.delete_file(item["s3_key"])
-            db_service.delete_video(item_id)
+            _release_file(item)
             flash("Video deleted successfully", "success")
     else:
         flash("Invalid file type", "error")
@@ -397,30 +848,134 @@ def delete_item(file_type, item_id):
     return redirect(url_for("main.browse"))
 
 
+@bp.route("/api/items/<file_type>/bulk-delete", methods=["POST"])
+def bulk_delete_items(file_type):
+    """Delete many items of one type with batched DynamoDB and S3 calls"""
+    if file_type not in MODEL_FACTORIES:
+        return jsonify({"error": "Invalid file type"}), 400
+
+    item_ids = (request.get_json(silent=True) or {}).get("ids")
+    if (
+        not isinstance(item_ids, list)
+        or not item_ids
+        or not all(isinstance(item_id, str) and item_id for item_id in item_ids)
+    ):
+        return jsonify({"error": "ids must be a non-empty list of item IDs"}), 400
+    if len(item_ids) > Config.BULK_MAX_ITEMS:
+        return (
+            jsonify({"error": f"At most {Config.BULK_MAX_ITEMS} items per request"}),
+            400,
+        )
+
+    deleted, not_found, failed = db_service.delete_items(file_type, item_ids)
+    failed_keys = _release_files(deleted)
+
+    id_key = ID_KEYS[file_type]
+    return (
+        jsonify(
+            {
+                "deleted": [item[id_key] for item in deleted],
+                "not_found": not_found,
+                "failed": failed,
+                "failed_keys": failed_keys,
+            }
+        ),
+        207 if failed or failed_keys else 200,
+    )
+
+
 @bp.route("/api/items/<file_type>")
 def api_get_items(file_type):
-    """API endpoint to get items (for AJAX)"""
-    if file_type == "notes":
-        items = db_service.get_all_notes()
-        items = [create_note_from_dict(item) for item in items]
-    elif file_type == "images":
-        items = db_service.get_all_images()
-        items = [create_image_from_dict(item) for item in items]
-    elif file_type == "videos":
-        items = db_service.get_all_videos()
-        items = [create_video_from_dict(item) for item in items]
-    else:
-        items = []
+    """API endpoint to get one page of items (for AJAX)
+
+    With ?format=ndjson (or Accept: application/x-ndjson) every item from
+    the cursor to the end of the table is streamed instead, one JSON object
+    per line. Both forms are gzip-compressed when the client accepts it.
+    """
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor") or None
+    ndjson = (
+        request.args.get("format") == "ndjson"
+        or request.accept_mimetypes.best == NDJSON_MIMETYPE
+    )
+    use_gzip = request.accept_encodings["gzip"] > 0
 
-    # Convert items to dictionaries for JSON serialization
-    items_dict = []
-    for item in items:
-        item_dict = item.__dict__.copy()
-        # Remove any private attributes
-        item_dict = {k: v for k, v in item_dict.items() if not k.startswith("_")}
-        items_dict.append(item_dict)
+    etag, last_modified = (
+        _validators([file_type], limit, cursor, ndjson, use_gzip, page=False)
+        if file_type in MODEL_FACTORIES
+        else (None, None)
+    )
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    if ndjson:
+        if file_type not in MODEL_FACTORIES:
+            return Response(b"", mimetype=NDJSON_MIMETYPE)
+        try:
+            pages = db_service.iter_pages(file_type, cursor=cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response = Response(
+            stream_with_context(_ndjson_stream(file_type, pages, use_gzip)),
+            mimetype=NDJSON_MIMETYPE,
+        )
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        return _with_validators(response, etag, last_modified)
 
-    return jsonify(items_dict)
+    if file_type in MODEL_FACTORIES:
+        try:
+            items, next_cursor = db_service.list_items(
+                file_type, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        items, next_cursor = [], None
+
+    # Serialize the raw items directly instead of building records first
+    serialized = map(item_serializer(RECORD_TYPES[file_type]), items) if items else ()
+    body = (
+        '{"items":['
+        + ",".join(serialized)
+        + '],"next_cursor":'
+        + json.dumps(next_cursor)
+        + "}"
+    ).encode("utf-8")
+
+    response = Response(body, mimetype="application/json")
+    if use_gzip and len(body) >= Config.GZIP_MIN_BYTES:
+        response.set_data(gzip.compress(body, compresslevel=Config.GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return _with_validators(response, etag, last_modified)
+
+
+def _ndjson_stream(file_type, pages, use_gzip):
+    """Yield the items of scan pages as NDJSON, optionally gzip-compressed
+
+    Every page is flushed as soon as it is encoded, so clients can start on
+    the first items while later pages are still being read. Memory use is
+    bound by one page whatever the table size.
+    """
+    serialize = item_serializer(RECORD_TYPES[file_type])
+    # wbits=31 writes a gzip (rather than raw zlib) stream
+    compressor = zlib.compressobj(Config.GZIP_LEVEL, zlib.DEFLATED, 31)
+    try:
+        for page in pages:
+            chunk = "".join(serialize(item) + "\n" for item in page).encode("utf-8")
+            if use_gzip:
+                chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if chunk:
+                yield chunk
+    except Exception as e:
+        # The status line is already sent; ending early leaves a truncated body
+        print(f"Error streaming {file_type}: {e}")
+        return
+    if use_gzip:
+        yield compressor.flush()
 
 
 @bp.route("/health")
@@ -430,8 +985,8 @@ def health_check():
         # Test S3 connection
         s3_service.list_files(prefix="uploads/")
 
-        # Test DynamoDB connection
-        db_service.get_all_notes()
+        # Test DynamoDB connection with a one-item read
+        db_service.list_items("notes", limit=1, projection="stats")
 
         return jsonify(
             {
@@ -448,11 +1003,11 @@ def health_check():
 def download_item(file_type, item_id):
     """Download a file"""
     if file_type == "note":
-        item = db_service.get_note_by_id(item_id)
+        item = db_service.get_note_by_id(item_id, projection="card")
     elif file_type == "image":
-        item = db_service.get_image_by_id(item_id)
+        item = db_service.get_image_by_id(item_id, projection="card")
     elif file_type == "video":
-        item = db_service.get_video_by_id(item_id)
+        item = db_service.get_video_by_id(item_id, projection="card")
     else:
         flash("Invalid file type", "error")
         return redirect(url_for("main.browse"))
@@ -461,43 +1016,91 @@ def download_item(file_type, item_id):
         flash("Item not found", "error")
         return redirect(url_for("main.browse"))
 
-    try:
-        # Get the file from S3
-        import boto3
-        from config import Config
-
-        s3_client = boto3.client(
-            "s3",
-            endpoint_url=Config.AWS_ENDPOINT_URL,
-            aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
-            region_name=Config.AWS_DEFAULT_REGION,
+    # Let the client fetch the bytes from S3 itself
+    if Config.MEDIA_DELIVERY == "presigned":
+        download_name = (
+            None if request.args.get("inline") else item["original_filename"]
         )
-
-        # Download the file
-        response = s3_client.get_object(
-            Bucket=Config.S3_BUCKET_NAME,
-            Key=item["s3_key"],
+        return redirect(
+            s3_service.get_presigned_url(item["s3_key"], download_name=download_name)
         )
 
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-            tmp_file.write(response["Body"].read())
-            tmp_path = tmp_file.name
-
-        # Send the file
-        return send_file(
-            tmp_path,
-            as_attachment=True,
-            download_name=item["original_filename"],
-            mimetype=item.get("file_type", "application/octet-stream"),
+    try:
+        return _stream_file(
+            item["s3_key"],
+            item.get("file_type", "application/octet-stream"),
+            item["original_filename"],
+            inline=bool(request.args.get("inline")),
         )
-
     except Exception as e:
         flash(f"Download failed: {str(e)}", "error")
         return redirect(url_for("main.view_item", file_type=file_type, item_id=item_id))
 
 
+@bp.route("/thumbnail/<image_id>/<size>.<fmt>")
+def thumbnail(image_id, size, fmt):
+    """Serve one thumbnail of an image (used when MEDIA_DELIVERY=proxy)"""
+    item = db_service.get_image_by_id(image_id, projection="card") or {}
+    entry = (item.get("thumbnails") or {}).get(size) or {}
+    if fmt not in THUMBNAIL_FORMATS or fmt not in entry:
+        abort(404)
+
+    response = _stream_file(
+        entry[fmt], THUMBNAIL_FORMATS[fmt][1], f"{size}.{fmt}", inline=True
+    )
+    # Thumbnail keys are derived from the original's unique key and never change
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def _stream_file(s3_key, mimetype, filename, inline=False):
+    """Stream an S3 object, or the single byte range requested, to the client"""
+    # Pass a single byte range (e.g. video seeking) straight through to S3
+    byte_range = None
+    if request.range and len(request.range.ranges) == 1:
+        byte_range = request.range.to_header()
+
+    try:
+        response = s3_service.get_file_stream(s3_key, byte_range)
+    except ClientError as e:
+        error = e.response.get("Error", {})
+        if error.get("Code") == "InvalidRange":
+            # Content-Range tells the client the size to retry against
+            size = error.get("ActualObjectSize")
+            if size is None:
+                size = (s3_service.head_file(s3_key) or {}).get("ContentLength")
+            headers = {"Accept-Ranges": "bytes"}
+            if size is not None:
+                headers["Content-Range"] = f"bytes */{size}"
+            return Response(status=416, headers=headers)
+        raise
+
+    body = response["Body"]
+
+    def generate():
+        try:
+            for chunk in body.iter_chunks(Config.DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    disposition = "inline" if inline else "attachment"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(response["ContentLength"]),
+        "Content-Disposition": f'{disposition}; filename="{filename}"',
+    }
+    if response.get("ContentRange"):
+        headers["Content-Range"] = response["ContentRange"]
+
+    return Response(
+        stream_with_context(generate()),
+        status=206 if response.get("ContentRange") else 200,
+        headers=headers,
+        mimetype=mimetype,
+    )
+
+
 @bp.route("/search")
 def search():
     """Search across all file types"""
@@ -506,21 +1109,15 @@ def search():
     if not query:
         return redirect(url_for("main.browse"))
 
-    # Search in all tables
-    notes = db_service.search_items("notes", query)
-    images = db_service.search_items("images", query)
-    videos = db_service.search_items("videos", query)
+    # Search all tables concurrently
+    results = db_service.search_all(query, projection="card")
+    notes, images, videos = results["notes"], results["images"], results["videos"]
 
     # Convert to models
     notes_models = [create_note_from_dict(note) for note in notes]
     images_models = [create_image_from_dict(image) for image in images]
     videos_models = [create_video_from_dict(video) for video in videos]
 
-    # Format file sizes
-    for item in notes_models + images_models + videos_models:
-        if hasattr(item, "file_size"):
-            item.formatted_size = format_file_size(item.file_size)
-
     return render_template(
         "search_results.html",
         query=query,
@@ -531,6 +1128,33 @@ def search():
     )
 
 
+@bp.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    """Status of a background job queued by an upload"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@bp.route("/metrics")
+def metrics_endpoint():
+    """Request, AWS call and capacity metrics in Prometheus text format"""
+    if not Config.METRICS_ENABLED:
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters of the metadata and rendered-fragment caches"""
+    fragments = fragment_cache.stats()
+    cache = getattr(db_service, "cache", None)
+    if cache is None:
+        return jsonify({"enabled": False, "fragments": fragments})
+    return jsonify({"enabled": True, **cache.stats(), "fragments": fragments})
+
+
 @bp.route("/api/health/detailed")
 def detailed_health_check():
     """Detailed health check for all services"""
@@ -563,6 +1187,8 @@ def detailed_health_check():
             Config.NOTES_TABLE,
             Config.IMAGES_TABLE,
             Config.VIDEOS_TABLE,
+            Config.COUNTERS_TABLE,
+            Config.SEARCH_TABLE,
         ]
 
         health_data["services"]["dynamodb"] = {
@@ -576,4 +1202,10 @@ def detailed_health_check():
         health_data["services"]["dynamodb"] = {"status": "unhealthy", "error": str(e)}
         health_data["overall"] = "unhealthy"
 
+    try:
+        health_data["services"]["jobs"] = {"status": "healthy", **job_queue.counts()}
+    except Exception as e:
+        health_data["services"]["jobs"] = {"status": "unhealthy", "error": str(e)}
+        health_data["overall"] = "unhealthy"
+
     return jsonify(health_data)
@@ -1,26 +1,44 @@
-import boto3
 import os
+import tempfile
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from config import Config
 import uuid
 from werkzeug.utils import secure_filename
+from app.cache import TTLCache
+from app.aws import get_client
 
 
 class S3Service:
     def __init__(self):
-        self.s3_client = boto3.client(
-            "s3",
-            endpoint_url=Config.AWS_ENDPOINT_URL,
-            aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
-            region_name=Config.AWS_DEFAULT_REGION,
-        )
+        self.s3_client = get_client("s3")
         self.bucket_name = Config.S3_BUCKET_NAME
+        self.transfer_config = TransferConfig(
+            multipart_threshold=Config.UPLOAD_MULTIPART_THRESHOLD,
+            multipart_chunksize=Config.UPLOAD_MULTIPART_CHUNKSIZE,
+            max_concurrency=Config.UPLOAD_MAX_CONCURRENCY,
+        )
+
+        # Presigned URLs are reused until they are close to expiring
+        self.presigned_urls = TTLCache(
+            max_size=Config.PRESIGNED_URL_CACHE_SIZE,
+            ttl=max(
+                Config.PRESIGNED_URL_EXPIRES - Config.PRESIGNED_URL_REFRESH_MARGIN, 0
+            ),
+        )
 
     def upload_file(
-        self, file_obj, content_type, folder="uploads", original_filename=None
+        self,
+        file_obj,
+        content_type,
+        folder="uploads",
+        original_filename=None,
+        s3_key=None,
     ):
-        """Upload a file to S3 and return its URL"""
+        """Upload a file to S3 and return its URL
+
+        s3_key overrides the generated "folder/uuid.ext" key.
+        """
         try:
             # Generate unique filename
             if original_filename:
@@ -30,10 +48,13 @@ class S3Service:
                 original_filename = "uploaded_file"
                 file_extension = ""
 
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
+            if s3_key:
+                unique_filename = s3_key.rsplit("/", 1)[-1]
+            else:
+                unique_filename = f"{uuid.uuid4()}{file_extension}"
 
-            # Create S3 key
-            s3_key = f"{folder}/{unique_filename}"
+                # Create S3 key
+                s3_key = f"{folder}/{unique_filename}"
 
             # Upload to S3
             self.s3_client.upload_fileobj(
@@ -41,6 +62,7 @@ class S3Service:
                 self.bucket_name,
                 s3_key,
                 ExtraArgs={"ContentType": content_type},
+                Config=self.transfer_config,
             )
 
             # Generate URL (LocalStack specific)
@@ -59,10 +81,84 @@ class S3Service:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def new_file_key(self, folder, original_filename):
+        """Build a unique "folder/uuid.ext" key for a new file"""
+        file_extension = os.path.splitext(secure_filename(original_filename))[1]
+        return f"{folder}/{uuid.uuid4()}{file_extension.lower()}"
+
+    def content_key(self, folder, original_filename, sha256):
+        """Build the content-addressed "folder/<sha256>.ext" key for a file"""
+        file_extension = os.path.splitext(secure_filename(original_filename))[1]
+        return f"{folder}/{sha256}{file_extension.lower()}"
+
+    def create_presigned_upload(self, s3_key, content_type, max_size):
+        """Get a presigned POST that lets a browser upload one file directly
+
+        The policy pins the key and Content-Type and caps the size, so the
+        form can only be used for the file it was issued for.
+        """
+        return self.s3_client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=Config.PRESIGNED_UPLOAD_EXPIRES,
+        )
+
+    def head_file(self, s3_key):
+        """Get a file's metadata, or None if it does not exist"""
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+
+    def read_range(self, s3_key, start, length):
+        """Read length bytes of a file starting at offset start"""
+        response = self.get_file_stream(s3_key, f"bytes={start}-{start + length - 1}")
+        return response["Body"].read()
+
     def get_file_url(self, s3_key):
         """Generate a URL for the file"""
         return f"{Config.AWS_ENDPOINT_URL}/{self.bucket_name}/{s3_key}"
 
+    def get_presigned_url(self, s3_key, download_name=None):
+        """Get a short-lived presigned GET URL for a file
+
+        With download_name the URL makes S3 answer with an attachment
+        Content-Disposition, so the browser saves the file under that name.
+        """
+        return self.presigned_urls.get_or_load(
+            (s3_key, download_name),
+            lambda: self._presign_get(s3_key, download_name),
+        )
+
+    def _presign_get(self, s3_key, download_name):
+        params = {"Bucket": self.bucket_name, "Key": s3_key}
+        if download_name:
+            params["ResponseContentDisposition"] = (
+                f'attachment; filename="{download_name}"'
+            )
+        return self.s3_client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=Config.PRESIGNED_URL_EXPIRES
+        )
+
+    def get_file_stream(self, s3_key, byte_range=None):
+        """Open a file (or a byte range of it) for streaming
+
+        byte_range is an HTTP Range value such as "bytes=0-1023". The returned
+        get_object response has a streaming "Body" and, for ranged requests,
+        a "ContentRange" header value.
+        """
+        params = {"Bucket": self.bucket_name, "Key": s3_key}
+        if byte_range:
+            params["Range"] = byte_range
+        return self.s3_client.get_object(**params)
+
     def delete_file(self, s3_key):
         """Delete a file from S3"""
         try:
@@ -71,6 +167,41 @@ class S3Service:
         except ClientError:
             return False
 
+    def delete_files(self, s3_keys):
+        """Delete many files with batched delete_objects calls
+
+        Returns the keys that could not be deleted.
+        """
+        failed = []
+        # DeleteObjects accepts at most 1,000 keys per call
+        for start in range(0, len(s3_keys), 1000):
+            batch = s3_keys[start : start + 1000]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except ClientError:
+                failed.extend(batch)
+                continue
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
+    def put_bytes(self, s3_key, data, content_type):
+        """Store a small in-memory object (e.g. a thumbnail)"""
+        self.s3_client.put_object(
+            Bucket=self.bucket_name, Key=s3_key, Body=data, ContentType=content_type
+        )
+
+    def download_to_spool(self, s3_key):
+        """Copy a file into a seekable temp file (kept in memory when small)"""
+        spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        self.s3_client.download_fileobj(
+            self.bucket_name, s3_key, spool, Config=self.transfer_config
+        )
+        spool.seek(0)
+        return spool
+
     def list_files(self, prefix="uploads/"):
         """List all files in the bucket with given prefix"""
         try:
@@ -0,0 +1,174 @@
+import re
+import unicodedata
+from boto3.dynamodb.conditions import Key
+from app.aws import get_table
+
+# Fields that are indexed and how much a match in each one is worth
+FIELD_WEIGHTS = {"title": 3, "original_filename": 2, "description": 1}
+
+# Score multiplier for a whole-word match over a prefix match
+EXACT_MATCH_BOOST = 2
+
+MAX_TOKEN_LENGTH = 64
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    """Lower-case text and strip accents so 'Café' and 'cafe' match"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold()
+
+
+def tokenize(text):
+    """Split text into normalized search tokens (in order, without duplicates)"""
+    tokens = []
+    seen = set()
+    for match in TOKEN_RE.finditer(normalize(text)):
+        token = match.group(0)[:MAX_TOKEN_LENGTH]
+        if token not in seen:
+            seen.add(token)
+            tokens.append(token)
+    return tokens
+
+
+def weigh_terms(item):
+    """Map every token of an item to the sum of the weights of its fields"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(item.get(field)):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+class SearchIndex:
+    """Inverted index of item terms stored in a DynamoDB table
+
+    Each posting is keyed by ``bucket`` (file type + first character of the
+    term) and ``term_ref`` (``term#item_id``), so a prefix lookup is a single
+    Query whose cost grows with the number of matching postings only.
+    """
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    @property
+    def table(self):
+        return get_table(self.table_name)
+
+    @staticmethod
+    def _bucket(file_type, term):
+        return f"{file_type}#{term[0]}"
+
+    def index_item(self, file_type, item_id, item):
+        """Add postings for every term of an item"""
+        self.index_items(file_type, [(item_id, item)])
+
+    def index_items(self, file_type, items):
+        """Add postings for many (item_id, item) pairs in one batch
+
+        items may be any iterable (e.g. a scan generator); returns how many
+        items were indexed.
+        """
+        indexed = 0
+        with self.table.batch_writer() as batch:
+            for item_id, item in items:
+                indexed += 1
+                for term, weight in weigh_terms(item).items():
+                    batch.put_item(
+                        Item={
+                            "bucket": self._bucket(file_type, term),
+                            "term_ref": f"{term}#{item_id}",
+                            "term": term,
+                            "item_id": item_id,
+                            "weight": weight,
+                        }
+                    )
+        return indexed
+
+    def remove_item(self, file_type, item_id, item):
+        """Remove the postings written for an item"""
+        with self.table.batch_writer() as batch:
+            for term in weigh_terms(item):
+                batch.delete_item(
+                    Key={
+                        "bucket": self._bucket(file_type, term),
+                        "term_ref": f"{term}#{item_id}",
+                    }
+                )
+
+    def remove_items(self, file_type, items):
+        """Remove the postings of many (item_id, item) pairs in one batch"""
+        with self.table.batch_writer() as batch:
+            for item_id, item in items:
+                for term in weigh_terms(item):
+                    batch.delete_item(
+                        Key={
+                            "bucket": self._bucket(file_type, term),
+                            "term_ref": f"{term}#{item_id}",
+                        }
+                    )
+
+    def _lookup(self, file_type, prefix):
+        """Get {item_id: score} for every term starting with prefix"""
+        scores = {}
+        query_kwargs = {
+            "KeyConditionExpression": Key("bucket").eq(self._bucket(file_type, prefix))
+            & Key("term_ref").begins_with(prefix),
+            "ProjectionExpression": "#term, item_id, weight",
+            "ExpressionAttributeNames": {"#term": "term"},
+        }
+        while True:
+            response = self.table.query(**query_kwargs)
+            for posting in response.get("Items", []):
+                score = int(posting["weight"])
+                if posting["term"] == prefix:
+                    score *= EXACT_MATCH_BOOST
+                item_id = posting["item_id"]
+                scores[item_id] = max(scores.get(item_id, 0), score)
+
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return scores
+            query_kwargs["ExclusiveStartKey"] = last_key
+
+    def search(self, file_type, query, limit=None):
+        """Get item IDs matching every query term, best matches first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # Look up the most selective (longest) term first so we can stop early
+        scores = None
+        for term in sorted(terms, key=len, reverse=True):
+            matches = self._lookup(file_type, term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    item_id: score + matches[item_id]
+                    for item_id, score in scores.items()
+                    if item_id in matches
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], item_id))
+        return ranked[:limit] if limit else ranked
+
+    def clear(self, file_types=None):
+        """Delete every posting, or those of some file types (before a rebuild)"""
+        scan_kwargs = {"ProjectionExpression": "#b, term_ref"}
+        scan_kwargs["ExpressionAttributeNames"] = {"#b": "bucket"}
+        with self.table.batch_writer() as batch:
+            while True:
+                response = self.table.scan(**scan_kwargs)
+                for key in response.get("Items", []):
+                    if file_types and key["bucket"].split("#", 1)[0] not in file_types:
+                        continue
+                    batch.delete_item(Key=key)
+                last_key = response.get("LastEvaluatedKey")
+                if not last_key:
+                    return
+                scan_kwargs["ExclusiveStartKey"] = last_key
@@ -0,0 +1,87 @@
+import io
+import os
+from PIL import Image, ImageOps
+from config import Config
+
+# Output formats: name -> (Pillow format, MIME type)
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def thumbnail_key(s3_key, size, fmt):
+    """S3 key of one thumbnail, derived from the original's key"""
+    base = os.path.splitext(s3_key)[0]
+    return f"thumbnails/{base}/{size}.{fmt}"
+
+
+def render_thumbnails(file_obj, sizes=None):
+    """Render every thumbnail size and format of an image
+
+    Returns a list of (size, width, height, fmt, data) tuples, largest first.
+    Sizes at or above the image's longest edge are not upscaled copies:
+    they are replaced by a single rendition at the original size. JPEGs are decoded with draft() at the smallest DCT scale that still covers
+    the largest thumbnail, and other formats are shrunk with reduce() before
+    the final resample, so big camera photos are never fully decoded.
+    """
+    sizes = sorted(sizes or Config.THUMBNAIL_SIZES, reverse=True)
+    largest = sizes[0]
+
+    rendered = []
+    with Image.open(file_obj) as img:
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((largest, largest), Image.LANCZOS, reducing_gap=2.0)
+
+        has_alpha = img.mode in ("RGBA", "LA") or "transparency" in img.info
+        base = img.convert("RGBA" if has_alpha else "RGB")
+
+        longest = max(base.size)
+        smaller = [size for size in sizes if size < longest]
+        if len(smaller) < len(sizes):
+            smaller.insert(0, longest)
+
+        for size in smaller:
+            # Each size is scaled down from the previous, already small, one
+            base.thumbnail((size, size), Image.LANCZOS)
+            for fmt, (pil_format, _) in THUMBNAIL_FORMATS.items():
+                frame = base.convert("RGB") if pil_format == "JPEG" else base
+                buffer = io.BytesIO()
+                frame.save(
+                    buffer, pil_format, quality=Config.THUMBNAIL_QUALITY, optimize=True
+                )
+                rendered.append((size, base.width, base.height, fmt, buffer.getvalue()))
+    return rendered
+
+
+def generate_thumbnails(s3_service, file_obj, s3_key):
+    """Render and upload thumbnails for an image stored at s3_key
+
+    Returns the record stored on the Image model, e.g.
+    {"320": {"width": 320, "height": 240, "webp": key, "jpeg": key}}, or {}
+    if the image cannot be decoded (e.g. SVG).
+    """
+    try:
+        rendered = render_thumbnails(file_obj)
+    except Exception as e:
+        print(f"Error generating thumbnails: {e}")
+        return {}
+
+    thumbnails = {}
+    for size, width, height, fmt, data in rendered:
+        key = thumbnail_key(s3_key, size, fmt)
+        s3_service.put_bytes(key, data, THUMBNAIL_FORMATS[fmt][1])
+        entry = thumbnails.setdefault(str(size), {"width": width, "height": height})
+        entry[fmt] = key
+    return thumbnails
+
+
+def thumbnail_keys(thumbnails):
+    """All S3 keys referenced by a thumbnails record"""
+    return [
+        entry[fmt]
+        for entry in (thumbnails or {}).values()
+        for fmt in THUMBNAIL_FORMATS
+        if fmt in entry
+    ]
@@ -0,0 +1,65 @@
+import hashlib
+
+
+class UploadStream:
+    """Read-once view of an incoming upload
+
+    The first ``sniff_bytes`` of the source are read up front so the file
+    type and dimensions can be checked before anything is sent to S3; reads
+    then replay that header and continue with the rest of the source. Every
+    byte handed out is counted and hashed, so the size and SHA-256 are known
+    once S3 has consumed the stream, without a stat() or a second pass.
+    """
+
+    def __init__(self, source, sniff_bytes=64 * 1024):
+        self.source = source
+        self.header = self._read_exactly(sniff_bytes)
+        self._pending = self.header
+        self.bytes_read = 0
+        self._sha256 = hashlib.sha256()
+
+    def _read_exactly(self, size):
+        """Read up to size bytes, looping over short reads"""
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = self.source.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def read(self, size=-1):
+        if self._pending:
+            if size is None or size < 0:
+                data = self._pending + self.source.read()
+                self._pending = b""
+            else:
+                data = self._pending[:size]
+                self._pending = self._pending[size:]
+                if len(data) < size:
+                    data += self.source.read(size - len(data))
+        else:
+            data = (
+                self.source.read()
+                if size is None or size < 0
+                else self.source.read(size)
+            )
+
+        self.bytes_read += len(data)
+        self._sha256.update(data)
+        return data
+
+    def drain(self, chunk_size=1024 * 1024):
+        """Consume the rest of the stream (counting and hashing it)"""
+        while self.read(chunk_size):
+            pass
+
+    @property
+    def sha256(self):
+        """Hex SHA-256 of everything read so far"""
+        return self._sha256.hexdigest()
+
+    def readable(self):
+        return True
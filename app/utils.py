@@ -1,9 +1,12 @@
 import os
+import json
 from PIL import Image
 import filetype
 from config import Config
-import tempfile
+import io
+from datetime import datetime
 from decimal import Decimal  # Add this import
+from app.media_probe import probe_image_prefix
 
 
 def allowed_file(filename, file_type):
@@ -28,15 +31,19 @@ def get_file_type(filename):
     return "unknown"
 
 
-def get_mime_type(file_path):
-    """Get MIME type of file using filetype library"""
+def get_mime_type(file_path, filename=None):
+    """Get MIME type of file using filetype library
+
+    file_path may also be the first bytes of a file, in which case filename
+    is used for the extension fallback.
+    """
     try:
         kind = filetype.guess(file_path)
         if kind is not None:
             return kind.mime
         else:
             # Fallback based on extension
-            ext = os.path.splitext(file_path)[1].lower()
+            ext = os.path.splitext(filename or file_path)[1].lower()
             mime_map = {
                 ".pdf": "application/pdf",
                 ".txt": "text/plain",
@@ -65,25 +72,67 @@ def get_mime_type(file_path):
         return "application/octet-stream"
 
 
-def get_image_dimensions(file_path):
-    """Get image dimensions - Windows compatible version"""
+def get_image_info(file_path):
+    """Get format, dimensions and EXIF orientation from an image's header
+
+    file_path may be a path, a seekable file-like object or the bytes of
+    the file. The probe reads the first SNIFF_BYTES and only reads further
+    when the header did not fit (see probe_image_prefix); Pillow, which
+    also stops after the header, is the fallback for formats the probe
+    does not know.
+    """
+    if isinstance(file_path, str):
+        with open(file_path, "rb") as f:
+            return get_image_info(f)
+    if isinstance(file_path, (bytes, bytearray)):
+        source = io.BytesIO(file_path)
+    else:
+        source = file_path
+
+    def read_prefix(length):
+        source.seek(0)
+        return source.read(length)
+
+    info = probe_image_prefix(read_prefix, Config.SNIFF_BYTES)
+    source.seek(0)
+    if info is not None:
+        return info
+
     try:
-        # Copy file to a new location to avoid locking issues
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".img") as tmp_img:
-            tmp_path = tmp_img.name
-            with open(file_path, "rb") as src:
-                tmp_img.write(src.read())
-
-        # Now open the copied file
-        with Image.open(tmp_path) as img:
-            dimensions = {"width": img.width, "height": img.height}
-
-        # Delete the temporary copy
-        os.unlink(tmp_path)
-        return dimensions
+        with Image.open(source) as img:
+            return {
+                "format": (img.format or "").lower(),
+                "width": img.width,
+                "height": img.height,
+                "orientation": 1,
+            }
     except Exception as e:
         print(f"Error getting image dimensions: {e}")
-        return {"width": 0, "height": 0}
+        return None
+
+
+def split_image_info(info):
+    """Split get_image_info() output into (dimensions, exif_data) record fields"""
+    if not info:
+        return {"width": 0, "height": 0}, {}
+    dimensions = {"width": info["width"], "height": info["height"]}
+    exif_data = {k: v for k, v in info.items() if k not in dimensions}
+    return dimensions, exif_data
+
+
+def split_video_info(info):
+    """Turn probe_video() output into (duration, resolution) record fields"""
+    if not info:
+        return Decimal(0), None
+    duration = Decimal(str(round(info["duration"], 3)))
+    if info.get("width") and info.get("height"):
+        return duration, f"{info['width']}x{info['height']}"
+    return duration, None
+
+
+def get_image_dimensions(file_path):
+    """Get image dimensions from the file header only"""
+    return split_image_info(get_image_info(file_path))[0]
 
 
 def format_file_size(size):
@@ -110,12 +159,12 @@ def format_file_size(size):
     return f"{size:.2f} TB"
 
 
-def validate_file_mime_type(file_path, expected_type):
+def validate_file_mime_type(file_path, expected_type, filename=None):
     """
     Validate that the file's actual MIME type matches expected type
     expected_type: 'notes', 'images', or 'videos'
     """
-    mime_type = get_mime_type(file_path)
+    mime_type = get_mime_type(file_path, filename)
 
     if expected_type == "notes":
         # Document MIME types
@@ -164,6 +213,28 @@ def validate_file_mime_type(file_path, expected_type):
     return False
 
 
+def json_default(value):
+    """json.dumps default for DynamoDB values
+
+    Integral Decimals (sizes, counts) stay ints and other Decimals become
+    floats; sets become sorted lists and datetimes ISO strings.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """JSONEncoder for DynamoDB values (see json_default)"""
+
+    def default(self, obj):
+        return json_default(obj)
+
+
 def convert_decimal_to_float(data):
     """Recursively convert Decimal objects to float in a dictionary/list"""
     if isinstance(data, Decimal):
@@ -174,3 +245,24 @@ def convert_decimal_to_float(data):
         return [convert_decimal_to_float(item) for item in data]
     else:
         return data
+
+
+def sort_files(files, sort_by="newest", order="desc"):
+    """Sort files based on criteria"""
+    if not files:
+        return files
+
+    # Determine sort key
+    if sort_by == "name":
+        sort_key = lambda x: (x.title or x.original_filename or "").lower()
+    elif sort_by == "size":
+        sort_key = lambda x: getattr(x, "file_size", 0)
+    elif sort_by == "type":
+        sort_key = lambda x: getattr(x, "file_type", "")
+    else:  # Default to date (newest/oldest)
+        sort_key = lambda x: getattr(x, "created_at", "")
+
+    # Sort the files
+    sorted_files = sorted(files, key=sort_key, reverse=(order == "desc"))
+
+    return sorted_files
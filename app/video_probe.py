@@ -0,0 +1,294 @@
+import os
+import struct
+
+# Matroska/WebM element IDs we need (IDs keep their length marker bits)
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+
+# Largest element body we are willing to read in one go (Info, Tracks, moov
+# children such as mvhd/tkhd are all far smaller than this)
+MAX_ELEMENT_READ = 4 * 1024 * 1024
+
+
+class RangeReader:
+    """Random access to a file through ranged reads, cached in fixed blocks
+
+    read_range(start, length) is any callable returning those bytes, e.g. a
+    seek+read on a local file or a ranged S3 GET. Box/element headers close
+    to each other land in the same block, so walking a container costs a
+    handful of reads however large the file is.
+    """
+
+    def __init__(self, read_range, size, block_size=64 * 1024):
+        self._read_range = read_range
+        self.size = size
+        self.block_size = block_size
+        self._blocks = {}
+
+    @classmethod
+    def from_file(cls, file_obj):
+        """Reader over a seekable local file object"""
+        file_obj.seek(0, os.SEEK_END)
+        size = file_obj.tell()
+
+        def read_range(start, length):
+            file_obj.seek(start)
+            return file_obj.read(length)
+
+        return cls(read_range, size)
+
+    @classmethod
+    def from_s3(cls, s3_service, s3_key, size=None):
+        """Reader over an S3 object, fetching only the blocks that are used"""
+        if size is None:
+            head = s3_service.head_file(s3_key)
+            if head is None:
+                raise FileNotFoundError(s3_key)
+            size = head["ContentLength"]
+        return cls(
+            lambda start, length: s3_service.read_range(s3_key, start, length), size
+        )
+
+    def read_at(self, offset, length):
+        """Read up to length bytes at offset (short only at end of file)"""
+        length = max(0, min(length, self.size - offset))
+        if length > self.block_size:
+            # Large reads (whole boxes) bypass the block cache
+            return self._read_range(offset, length)
+
+        chunks = []
+        end = offset + length
+        while offset < end:
+            index = offset // self.block_size
+            block = self._blocks.get(index)
+            if block is None:
+                start = index * self.block_size
+                block = self._read_range(start, min(self.block_size, self.size - start))
+                self._blocks[index] = block
+            begin = offset - index * self.block_size
+            chunk = block[begin : begin + end - offset]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+        return b"".join(chunks)
+
+
+def probe_video(reader):
+    """Get duration and resolution from a video container's headers
+
+    Supports MP4/MOV (moov anywhere in the file, including after mdat),
+    Matroska/WebM and AVI. Returns {"container", "duration", "width",
+    "height"} (duration in seconds) or None if the format is not recognised.
+    """
+    head = reader.read_at(0, 16)
+    try:
+        if head[4:8] in (b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip"):
+            return _probe_mp4(reader)
+        if head[:4] == b"\x1a\x45\xdf\xa3":
+            return _probe_matroska(reader)
+        if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+            return _probe_avi(reader)
+    except (struct.error, IndexError, ValueError):
+        return None
+    return None
+
+
+# MP4 / QuickTime
+
+
+def _iter_boxes(reader, start, end):
+    """Yield (type, box_start, header_size, box_size) for boxes in [start, end)"""
+    offset = start
+    while offset + 8 <= end:
+        header = reader.read_at(offset, 16)
+        size, box_type = struct.unpack_from(">I4s", header, 0)
+        header_size = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", header, 8)
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise ValueError("Corrupt MP4 box")
+        yield box_type, offset, header_size, size
+        offset += size
+
+
+def _probe_mp4(reader):
+    for box_type, start, header_size, size in _iter_boxes(reader, 0, reader.size):
+        if box_type == b"moov":
+            return _parse_moov(reader, start + header_size, start + size)
+    return None
+
+
+def _parse_moov(reader, start, end):
+    info = {"container": "mp4", "duration": 0.0, "width": 0, "height": 0}
+    for box_type, box_start, header_size, size in _iter_boxes(reader, start, end):
+        body = box_start + header_size
+        if box_type == b"mvhd":
+            data = reader.read_at(body, min(size - header_size, 32))
+            if data[0] == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, 12)
+            if timescale:
+                info["duration"] = duration / timescale
+        elif box_type == b"trak" and not info["width"]:
+            width, height = _parse_trak(reader, body, box_start + size)
+            info["width"], info["height"] = width, height
+    return info
+
+
+def _parse_trak(reader, start, end):
+    """Get (width, height) from a track's tkhd; audio tracks report 0x0"""
+    for box_type, box_start, header_size, size in _iter_boxes(reader, start, end):
+        if box_type == b"tkhd":
+            data = reader.read_at(box_start + header_size, min(size - header_size, 96))
+            # Width/height are 16.16 fixed point at the end of tkhd
+            offset = 84 if data[0] == 1 else 72
+            width, height = struct.unpack_from(">II", data, 4 + offset)
+            return width >> 16, height >> 16
+    return 0, 0
+
+
+# Matroska / WebM
+
+
+def _read_vint(reader, offset, keep_marker=False):
+    """Read an EBML variable-length integer; returns (value, length)"""
+    first = reader.read_at(offset, 1)[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML vint")
+
+    data = reader.read_at(offset, length)
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[1:]:
+        value = (value << 8) | byte
+    return value, length
+
+
+def _iter_elements(reader, start, end):
+    """Yield (element_id, data_start, data_size) for elements in [start, end)
+
+    data_size is None for elements of unknown size (live-streamed clusters).
+    """
+    offset = start
+    while offset < end:
+        element_id, id_length = _read_vint(reader, offset, keep_marker=True)
+        size, size_length = _read_vint(reader, offset + id_length)
+        data_start = offset + id_length + size_length
+        if size == (1 << (7 * size_length)) - 1:
+            yield element_id, data_start, None
+            return
+        yield element_id, data_start, size
+        offset = data_start + size
+
+
+def _read_uint(data):
+    return int.from_bytes(data, "big") if data else 0
+
+
+def _probe_matroska(reader):
+    info = {"container": "matroska", "duration": 0.0, "width": 0, "height": 0}
+    for element_id, start, size in _iter_elements(reader, 0, reader.size):
+        if element_id != MKV_SEGMENT:
+            continue
+        segment_end = reader.size if size is None else start + size
+
+        found_info = found_tracks = False
+        for child_id, child_start, child_size in _iter_elements(
+            reader, start, segment_end
+        ):
+            if child_size is None or child_id == MKV_CLUSTER:
+                # Headers come before the media data; stop at the first cluster
+                break
+            if child_size > MAX_ELEMENT_READ:
+                continue
+            if child_id == MKV_INFO:
+                _parse_mkv_info(reader.read_at(child_start, child_size), info)
+                found_info = True
+            elif child_id == MKV_TRACKS:
+                _parse_mkv_tracks(reader.read_at(child_start, child_size), info)
+                found_tracks = True
+            if found_info and found_tracks:
+                break
+        return info
+    return None
+
+
+def _parse_mkv_info(data, info):
+    buffer = RangeReader(lambda s, n: data[s : s + n], len(data))
+    timecode_scale = 1000000
+    duration = None
+    for element_id, start, size in _iter_elements(buffer, 0, len(data)):
+        value = data[start : start + size]
+        if element_id == MKV_TIMECODE_SCALE:
+            timecode_scale = _read_uint(value)
+        elif element_id == MKV_DURATION:
+            (duration,) = struct.unpack(">f" if size == 4 else ">d", value)
+    if duration is not None:
+        info["duration"] = duration * timecode_scale / 1e9
+
+
+def _parse_mkv_tracks(data, info):
+    buffer = RangeReader(lambda s, n: data[s : s + n], len(data))
+    for element_id, start, size in _iter_elements(buffer, 0, len(data)):
+        if element_id != MKV_TRACK_ENTRY:
+            continue
+        track_type = 0
+        width = height = 0
+        for child_id, child_start, child_size in _iter_elements(
+            buffer, start, start + size
+        ):
+            value = data[child_start : child_start + child_size]
+            if child_id == MKV_TRACK_TYPE:
+                track_type = _read_uint(value)
+            elif child_id == MKV_VIDEO:
+                for video_id, video_start, video_size in _iter_elements(
+                    buffer, child_start, child_start + child_size
+                ):
+                    number = _read_uint(data[video_start : video_start + video_size])
+                    if video_id == MKV_PIXEL_WIDTH:
+                        width = number
+                    elif video_id == MKV_PIXEL_HEIGHT:
+                        height = number
+        if track_type == 1:
+            info["width"], info["height"] = width, height
+            return
+
+
+# AVI
+
+
+def _probe_avi(reader):
+    # The main AVI header (avih) sits at the start of the hdrl list
+    data = reader.read_at(0, 512)
+    offset = data.find(b"avih")
+    if offset < 0:
+        return None
+    body = offset + 8
+    us_per_frame = struct.unpack_from("<I", data, body)[0]
+    total_frames = struct.unpack_from("<I", data, body + 16)[0]
+    width, height = struct.unpack_from("<II", data, body + 32)
+    return {
+        "container": "avi",
+        "duration": us_per_frame * total_frames / 1e6,
+        "width": width,
+        "height": height,
+    }
@@ -0,0 +1,121 @@
+"""Per-item cost and memory of decoding DynamoDB items into records
+
+Run from the repository root:
+
+    python -m benchmarks.bench_models [--items 100000]
+
+Compares the slotted records and single-pass decoder in app/models.py
+with the previous approach (copy + per-key isinstance conversion into a
+dataclass that stamps datetime.now() twice), kept below as a baseline.
+
+The reproducible gain is memory: about 608 vs 656 B/item. Decode time is
+about the same for both; the difference between them is smaller than the
+variation between runs.
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from app.models import decode_item
+from benchmarks.datasets import make_items
+
+
+@dataclass
+class LegacyImage:
+    title: Optional[str] = None
+    description: Optional[str] = None
+    s3_key: str = ""
+    file_url: str = ""
+    original_filename: str = ""
+    file_type: str = ""
+    file_size: int = 0
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    image_id: str = ""
+    dimensions: Optional[Dict[str, int]] = None
+    exif_data: Optional[Dict[str, Any]] = None
+    thumbnails: Optional[Dict[str, Any]] = None
+
+    def __post_init__(self):
+        if not self.created_at:
+            self.created_at = datetime.now().isoformat()
+        if not self.updated_at:
+            self.updated_at = datetime.now().isoformat()
+        if self.dimensions is None:
+            self.dimensions = {"width": 0, "height": 0}
+
+
+def legacy_decode(data):
+    converted = {}
+    for key, value in data.items():
+        if isinstance(value, Decimal):
+            converted[key] = float(value)
+        elif isinstance(value, dict):
+            converted[key] = {
+                k: float(v) if isinstance(v, Decimal) else v for k, v in value.items()
+            }
+        else:
+            converted[key] = value
+    return LegacyImage(
+        image_id=converted.get("image_id", ""),
+        title=converted.get("title"),
+        description=converted.get("description"),
+        s3_key=converted.get("s3_key", ""),
+        file_url=converted.get("file_url", ""),
+        original_filename=converted.get("original_filename", ""),
+        file_type=converted.get("file_type", ""),
+        file_size=converted.get("file_size", 0),
+        created_at=converted.get("created_at"),
+        updated_at=converted.get("updated_at"),
+        dimensions=converted.get("dimensions", {}),
+        exif_data=converted.get("exif_data", {}),
+        thumbnails=converted.get("thumbnails"),
+    )
+
+
+def measure(decode, items, repeat=5):
+    """Return (microseconds per item, bytes per record) for one decoder
+
+    The time is the best of repeat passes; single passes vary by more than
+    the difference between the decoders.
+    """
+    elapsed = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        records = [decode(item) for item in items]
+        taken = time.perf_counter() - started
+        elapsed = taken if elapsed is None else min(elapsed, taken)
+        del records
+
+    gc.collect()
+    tracemalloc.start()
+    records = [decode(item) for item in items]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return elapsed / len(items) * 1e6, allocated / len(items)
+
+
+def run(count):
+    items = make_items("images", count)
+    results = {
+        "legacy dataclass": measure(legacy_decode, items),
+        "slotted record": measure(lambda item: decode_item("images", item), items),
+    }
+    print(f"{count} image items")
+    for name, (per_item_us, per_item_bytes) in results.items():
+        print(f"  {name:<17} {per_item_us:6.2f} us/item  {per_item_bytes:7.0f} B/item")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    run(parser.parse_args().items)
@@ -0,0 +1,86 @@
+"""Synthetic, reproducible inputs for the benchmarks
+
+Items are shaped like DynamoDB returns them (numbers as Decimal, nested
+maps for dimensions/EXIF) and are generated from a fixed seed, so every
+run of a given size sees exactly the same data.
+"""
+
+import io
+import random
+from decimal import Decimal
+
+from PIL import Image
+
+SEED = 20240501
+
+WORDS = (
+    "holiday beach sunset family birthday party report budget draft final "
+    "meeting notes invoice receipt trip mountain lake city night concert "
+    "garden kitchen project summary café résumé"
+).split()
+
+EXTENSIONS = {"notes": "pdf", "images": "jpg", "videos": "mp4"}
+MIME_TYPES = {"notes": "application/pdf", "images": "image/jpeg", "videos": "video/mp4"}
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def make_items(file_type, count, seed=SEED):
+    """count items of one table, the same ones for the same arguments"""
+    rng = random.Random(f"{seed}-{file_type}")
+    id_key = f"{file_type[:-1]}_id"
+    ext = EXTENSIONS[file_type]
+    items = []
+    for i in range(count):
+        month, day = rng.randint(1, 12), rng.randint(1, 28)
+        created = f"2024-{month:02d}-{day:02d}T{rng.randint(0, 23):02d}:{i % 60:02d}:00"
+        item = {
+            id_key: f"{rng.getrandbits(128):032x}",
+            "title": _words(rng, rng.randint(1, 5)).title(),
+            "description": _words(rng, rng.randint(0, 20)),
+            "s3_key": f"{file_type}/{i}.{ext}",
+            "file_url": f"http://localhost:4566/memory-vault/{file_type}/{i}.{ext}",
+            "original_filename": f"{_words(rng, 2).replace(' ', '_')}_{i}.{ext}",
+            "file_type": MIME_TYPES[file_type],
+            "file_size": Decimal(rng.randint(1_000, 50_000_000)),
+            "created_at": created,
+            "updated_at": created,
+            "feed": "recent",
+        }
+        if file_type == "notes":
+            item["tags"] = [rng.choice(WORDS) for _ in range(rng.randint(0, 3))]
+        elif file_type == "images":
+            item["dimensions"] = {
+                "width": Decimal(rng.choice((640, 1920, 3024, 4032))),
+                "height": Decimal(rng.choice((480, 1080, 2268, 3024))),
+            }
+            item["exif_data"] = {
+                "format": "jpeg",
+                "orientation": Decimal(rng.randint(1, 8)),
+            }
+        else:
+            item["duration"] = Decimal(f"{rng.uniform(1, 600):.3f}")
+            item["resolution"] = rng.choice(("1280x720", "1920x1080", "3840x2160"))
+        items.append(item)
+    return items
+
+
+def _image_bytes(fmt, size):
+    out = io.BytesIO()
+    Image.new("RGB", size, (200, 80, 40)).save(out, format=fmt)
+    return out.getvalue()
+
+
+def make_headers():
+    """(header bytes, expected type, filename) samples of uploaded files"""
+    mp4 = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom" + b"\x00" * 64
+    return [
+        (_image_bytes("PNG", (64, 48)), "images", "photo.png"),
+        (_image_bytes("JPEG", (640, 480)), "images", "photo.jpg"),
+        (_image_bytes("GIF", (32, 32)), "images", "anim.gif"),
+        (b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n" + b"0" * 256, "notes", "report.pdf"),
+        (b"plain text notes\n" * 16, "notes", "notes.txt"),
+        (mp4, "videos", "clip.mp4"),
+    ]
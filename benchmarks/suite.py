@@ -0,0 +1,300 @@
+"""Microbenchmarks of the per-item and per-request hot paths
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--sizes 1000,10000,100000,1000000]
+                               [--cases decode.,sort.] [--repeat 5]
+                               [--baseline benchmarks/baseline.json]
+                               [--save-baseline]
+
+Every case is timed on synthetic datasets of each size (best of --repeat
+runs) and the results are written as JSON under benchmarks/results/. With
+--baseline, cases that got slower per item by more than --threshold are
+reported and the exit status is 1, so a CI job can catch regressions.
+Baselines are machine-specific: save one on the machine that compares.
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.datasets import make_headers, make_items
+
+from app.models import (
+    Image,
+    create_image_from_dict,
+    create_note_from_dict,
+    create_video_from_dict,
+    item_serializer,
+)
+from app.search_index import weigh_terms
+from app.utils import (
+    convert_decimal_to_float,
+    format_file_size,
+    get_image_dimensions,
+    get_mime_type,
+    sort_files,
+    validate_file_mime_type,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# name -> (setup function, scale); setup(count) prepares the inputs and
+# returns the zero-argument callable that is timed
+CASES = {}
+
+
+def case(name, scale="items"):
+    """Register a benchmark; scale "calls" cases are capped at --max-calls"""
+
+    def register(setup):
+        CASES[name] = (setup, scale)
+        return setup
+
+    return register
+
+
+_datasets = {}
+
+
+def dataset(file_type, count):
+    """Items shared by all cases of one size (generated once per size)"""
+    key = (file_type, count)
+    if key not in _datasets:
+        _datasets[key] = make_items(file_type, count)
+    return _datasets[key]
+
+
+def _cycle(samples, count):
+    return [samples[i % len(samples)] for i in range(count)]
+
+
+# Decoding DynamoDB items into records (every list page)
+
+
+@case("decode.notes")
+def _decode_notes(count):
+    items = dataset("notes", count)
+    return lambda: [create_note_from_dict(item) for item in items]
+
+
+@case("decode.images")
+def _decode_images(count):
+    items = dataset("images", count)
+    return lambda: [create_image_from_dict(item) for item in items]
+
+
+@case("decode.videos")
+def _decode_videos(count):
+    items = dataset("videos", count)
+    return lambda: [create_video_from_dict(item) for item in items]
+
+
+@case("serialize.images")
+def _serialize_images(count):
+    items = dataset("images", count)
+    serialize = item_serializer(Image)
+    return lambda: [serialize(item) for item in items]
+
+
+# Sorting the browse page
+
+
+def _sort_case(sort_by, order):
+    def setup(count):
+        records = [create_image_from_dict(item) for item in dataset("images", count)]
+        return lambda: sort_files(records, sort_by, order)
+
+    return setup
+
+
+case("sort.name")(_sort_case("name", "asc"))
+case("sort.size")(_sort_case("size", "desc"))
+case("sort.newest")(_sort_case("newest", "desc"))
+
+
+# Search: the pure-Python side of indexing (search_items itself is a
+# DynamoDB index lookup since the inverted index replaced the scan filter)
+
+
+@case("search.weigh_terms")
+def _weigh_terms(count):
+    items = dataset("notes", count)
+    return lambda: [weigh_terms(item) for item in items]
+
+
+# Formatting and conversion helpers
+
+
+@case("format_file_size")
+def _format_file_size(count):
+    sizes = [item["file_size"] for item in dataset("images", count)]
+    return lambda: [format_file_size(size) for size in sizes]
+
+
+@case("convert_decimal_to_float")
+def _convert_decimal(count):
+    items = dataset("images", count)
+    return lambda: [convert_decimal_to_float(item) for item in items]
+
+
+# Per-upload checks on the sniffed header bytes
+
+
+@case("mime.get_mime_type", scale="calls")
+def _get_mime_type(count):
+    samples = _cycle(make_headers(), count)
+    return lambda: [get_mime_type(header, name) for header, _, name in samples]
+
+
+@case("mime.validate", scale="calls")
+def _validate_mime(count):
+    samples = _cycle(make_headers(), count)
+    return lambda: [
+        validate_file_mime_type(header, expected, name)
+        for header, expected, name in samples
+    ]
+
+
+@case("image.dimensions", scale="calls")
+def _image_dimensions(count):
+    images = [s for s in make_headers() if s[1] == "images"]
+    samples = _cycle([header for header, _, _ in images], count)
+    return lambda: [get_image_dimensions(header) for header in samples]
+
+
+# Shortest time of one sample; quicker cases are looped to reach it so
+# small sizes are not dominated by timer and scheduling noise
+MIN_SAMPLE_SECONDS = 0.1
+
+
+def measure(run, repeat):
+    """Best wall time of one run over repeat samples, in seconds"""
+    started = time.perf_counter()
+    run()
+    loops = max(1, math.ceil(MIN_SAMPLE_SECONDS / (time.perf_counter() - started)))
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = (time.perf_counter() - started) / loops
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_suite(sizes, names, repeat, max_calls):
+    results = {name: {} for name in names}
+    for size in sizes:
+        _datasets.clear()
+        for name in names:
+            setup, scale = CASES[name]
+            count = min(size, max_calls) if scale == "calls" else size
+            if str(count) in results[name]:
+                continue
+            best = measure(setup(count), repeat)
+            results[name][str(count)] = {
+                "count": count,
+                "best_s": round(best, 6),
+                "per_item_us": round(best / count * 1e6, 4),
+            }
+            print(f"  {name:<26} {count:>9}  {best / count * 1e6:10.3f} us/item")
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print per-item changes against a baseline; return the regressions"""
+    regressions = []
+    for name, by_size in sorted(results.items()):
+        for size, current in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if not base:
+                continue
+            change = current["per_item_us"] / base["per_item_us"] - 1
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions.append((name, size, change))
+            print(f"  {name:<26} {size:>9}  {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument(
+        "--cases", default="", help="comma-separated name prefixes (default: all)"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-calls", type=int, default=10000)
+    parser.add_argument("--output", help="results file (default: results/<time>.json)")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help=f"also write {DEFAULT_BASELINE}"
+    )
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    prefixes = [p for p in args.cases.split(",") if p]
+    names = [n for n in CASES if not prefixes or n.startswith(tuple(prefixes))]
+    if not names:
+        parser.error(f"No cases match {args.cases!r}; known: {', '.join(CASES)}")
+
+    print(f"Running {len(names)} cases on sizes {sizes}")
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": run_suite(sizes, names, args.repeat, args.max_calls),
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    paths = [output] + ([DEFAULT_BASELINE] if args.save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Change per item against {args.baseline} ({baseline['meta']['commit']})")
+        regressions = compare(report["results"], baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
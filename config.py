@@ -14,17 +14,133 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "test")
     AWS_DEFAULT_REGION = os.getenv("AWS_DEFAULT_REGION", "us-east-1")
 
+    # Shared botocore client settings (see app/aws.py)
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+    AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+    AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "30"))
+    AWS_TCP_KEEPALIVE = os.getenv("AWS_TCP_KEEPALIVE", "true").lower() == "true"
+    AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "adaptive")
+    AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+
     # S3 Configuration
     S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "memory-vault")
 
+    # How templates link to media: "direct" (bucket URL), "proxy" (streamed
+    # through /download) or "presigned" (short-lived presigned S3 URLs)
+    MEDIA_DELIVERY = os.getenv("MEDIA_DELIVERY", "direct")
+    PRESIGNED_URL_EXPIRES = int(os.getenv("PRESIGNED_URL_EXPIRES", "900"))
+    PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv("PRESIGNED_URL_REFRESH_MARGIN", "120"))
+    PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "4096"))
+
+    # Browser-to-S3 uploads via presigned POST (the bucket needs a CORS rule
+    # allowing POST from the app's origin)
+    DIRECT_UPLOADS = os.getenv("DIRECT_UPLOADS", "false").lower() == "true"
+    PRESIGNED_UPLOAD_EXPIRES = int(os.getenv("PRESIGNED_UPLOAD_EXPIRES", "600"))
+    # Finalize claims expire (DynamoDB TTL on expires_at) once a replay of
+    # the same upload is no longer plausible
+    UPLOAD_CLAIM_TTL_SECONDS = int(
+        os.getenv("UPLOAD_CLAIM_TTL_SECONDS", str(7 * 24 * 3600))
+    )
+
     # DynamoDB Tables
     NOTES_TABLE = os.getenv("NOTES_TABLE", "MemoryVaultNotes")
     IMAGES_TABLE = os.getenv("IMAGES_TABLE", "MemoryVaultImages")
     VIDEOS_TABLE = os.getenv("VIDEOS_TABLE", "MemoryVaultVideos")
+    COUNTERS_TABLE = os.getenv("COUNTERS_TABLE", "MemoryVaultCounters")
+    SEARCH_TABLE = os.getenv("SEARCH_TABLE", "MemoryVaultSearchIndex")
+
+    # GSI on every item table: feed (HASH) + created_at (RANGE)
+    RECENT_INDEX = os.getenv("RECENT_INDEX", "RecentIndex")
+
+    # Maximum number of ranked search results returned per file type
+    SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "200"))
+
+    # Mixed into every ETag; change it on deploy so browsers drop pages
+    # rendered by the previous templates
+    ETAG_SALT = os.getenv("ETAG_SALT", "")
+
+    # Rendered page fragments (browse item lists, recent files), keyed by
+    # the version stamps of the tables they show
+    FRAGMENT_CACHE_ENABLED = (
+        os.getenv("FRAGMENT_CACHE_ENABLED", "true").lower() == "true"
+    )
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "256"))
+    FRAGMENT_CACHE_TTL_SECONDS = float(os.getenv("FRAGMENT_CACHE_TTL_SECONDS", "600"))
+
+    # Prometheus metrics on /metrics: request and AWS call latency, errors,
+    # transfer bytes and DynamoDB consumed capacity (which makes every
+    # DynamoDB call ask for ReturnConsumedCapacity=TOTAL)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # gzip for the items API when the client accepts it (JSON bodies smaller
+    # than GZIP_MIN_BYTES are sent as they are)
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+    GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
+    # Pagination (items per DynamoDB scan page)
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+    # Concurrent per-table reads for the dashboard, browse and search pages
+    FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", "16"))
+    FANOUT_TIMEOUT_SECONDS = float(os.getenv("FANOUT_TIMEOUT_SECONDS", "5"))
+
+    # Segments (worker threads) of full-table parallel scans
+    SCAN_SEGMENTS = int(os.getenv("SCAN_SEGMENTS", "4"))
+
+    # In-process metadata cache (per worker)
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+    CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+    CACHE_LIST_TTL_SECONDS = float(os.getenv("CACHE_LIST_TTL_SECONDS", "15"))
 
     # File upload settings
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB max file size
     UPLOAD_FOLDER = "/tmp/uploads"
+
+    # Bytes read from the start of a file to sniff its type and dimensions
+    SNIFF_BYTES = int(os.getenv("SNIFF_BYTES", str(64 * 1024)))
+
+    # Multipart settings for streaming uploads to S3
+    UPLOAD_MULTIPART_THRESHOLD = int(
+        os.getenv("UPLOAD_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))
+    )
+    UPLOAD_MULTIPART_CHUNKSIZE = int(
+        os.getenv("UPLOAD_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))
+    )
+    UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4"))
+
+    # Store uploads under their SHA-256 ("folder/<sha256>.ext") so identical
+    # files share one S3 object, reference-counted in the counters table
+    CONTENT_ADDRESSED_STORAGE = (
+        os.getenv("CONTENT_ADDRESSED_STORAGE", "false").lower() == "true"
+    )
+
+    # Image thumbnails (longest edge in pixels), stored as WebP and JPEG
+    THUMBNAILS_ENABLED = os.getenv("THUMBNAILS_ENABLED", "true").lower() == "true"
+    THUMBNAIL_SIZES = [
+        int(size) for size in os.getenv("THUMBNAIL_SIZES", "160,320,640").split(",")
+    ]
+    THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+    # Limits of the bulk delete and bulk upload APIs
+    BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+    BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "100"))
+    BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", "4"))
+
+    # Background jobs for derived data (thumbnails, video metadata), run on
+    # a bounded thread pool and tracked in a local SQLite table
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(UPLOAD_FOLDER, "jobs.db"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "2"))
+    # Running jobs are requeued when their worker has not heartbeated (every
+    # JOB_SWEEP_SECONDS) for JOB_STALE_SECONDS
+    JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", "15"))
+    JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+    # Size of each chunk streamed back to the client on downloads
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
     ALLOWED_EXTENSIONS = {
         "notes": {
             "pdf",
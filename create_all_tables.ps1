@@ -3,11 +3,15 @@ Write-Host "Creating DynamoDB tables for Memory Vault..."
 $endpoint = "http://localhost:4566"
 $region = "us-east-1"
 
+# Time-ordered "recent files" index shared by the notes, images and videos tables
+$recentIndex = '[{"IndexName":"RecentIndex","KeySchema":[{"AttributeName":"feed","KeyType":"HASH"},{"AttributeName":"created_at","KeyType":"RANGE"}],"Projection":{"ProjectionType":"ALL"}}]'
+
 # ---- Notes Table ----
 aws dynamodb create-table `
   --table-name MemoryVaultNotes `
-  --attribute-definitions AttributeName=note_id,AttributeType=S `
+  --attribute-definitions AttributeName=note_id,AttributeType=S AttributeName=feed,AttributeType=S AttributeName=created_at,AttributeType=S `
   --key-schema AttributeName=note_id,KeyType=HASH `
+  --global-secondary-indexes $recentIndex `
   --billing-mode PAY_PER_REQUEST `
   --endpoint-url $endpoint `
   --region $region
@@ -15,8 +19,9 @@ aws dynamodb create-table `
 # ---- Images Table ----
 aws dynamodb create-table `
   --table-name MemoryVaultImages `
-  --attribute-definitions AttributeName=image_id,AttributeType=S `
+  --attribute-definitions AttributeName=image_id,AttributeType=S AttributeName=feed,AttributeType=S AttributeName=created_at,AttributeType=S `
   --key-schema AttributeName=image_id,KeyType=HASH `
+  --global-secondary-indexes $recentIndex `
   --billing-mode PAY_PER_REQUEST `
   --endpoint-url $endpoint `
   --region $region
@@ -24,8 +29,34 @@ aws dynamodb create-table `
 # ---- Videos Table ----
 aws dynamodb create-table `
   --table-name MemoryVaultVideos `
-  --attribute-definitions AttributeName=video_id,AttributeType=S `
+  --attribute-definitions AttributeName=video_id,AttributeType=S AttributeName=feed,AttributeType=S AttributeName=created_at,AttributeType=S `
   --key-schema AttributeName=video_id,KeyType=HASH `
+  --global-secondary-indexes $recentIndex `
+  --billing-mode PAY_PER_REQUEST `
+  --endpoint-url $endpoint `
+  --region $region
+
+# ---- Counters Table (per-type counts and byte totals) ----
+aws dynamodb create-table `
+  --table-name MemoryVaultCounters `
+  --attribute-definitions AttributeName=counter_id,AttributeType=S `
+  --key-schema AttributeName=counter_id,KeyType=HASH `
+  --billing-mode PAY_PER_REQUEST `
+  --endpoint-url $endpoint `
+  --region $region
+
+# Finalize claims (upload#<key> rows) carry an expires_at epoch timestamp
+aws dynamodb update-time-to-live `
+  --table-name MemoryVaultCounters `
+  --time-to-live-specification "Enabled=true, AttributeName=expires_at" `
+  --endpoint-url $endpoint `
+  --region $region
+
+# ---- Search Index Table (inverted index of title/description/filename terms) ----
+aws dynamodb create-table `
+  --table-name MemoryVaultSearchIndex `
+  --attribute-definitions AttributeName=bucket,AttributeType=S AttributeName=term_ref,AttributeType=S `
+  --key-schema AttributeName=bucket,KeyType=HASH AttributeName=term_ref,KeyType=RANGE `
   --billing-mode PAY_PER_REQUEST `
   --endpoint-url $endpoint `
   --region $region